@@ -1,23 +1,80 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template
+from flask import Flask, Response, g, request, jsonify, send_from_directory, render_template
 import os
 import sys
+import time
 import traceback
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from test_generator import server
+from test_generator.admission import AdmissionController, AdmissionError
 from test_generator.generator import TestCaseGenerator
+from test_generator.http_cache import ResponseOptimizer
+from test_generator.metrics import Metrics
+from test_generator.ml_backend import MLGenerationBackend
+from test_generator.registry import TemplateRegistry
+from test_generator.server import overloaded_response, query_flag, request_deadline
+from test_generator.validation import TestCaseValidator
 
 app = Flask(__name__, 
            static_folder='../templates/static',
            template_folder='../templates')
 
-generator = TestCaseGenerator()
+# Each serverless instance is one process, so metrics are only written to files when METRICS_DIR is set
+metrics = Metrics(enabled=server.METRICS_ENABLED, state_dir=os.getenv('METRICS_DIR') or None)
+validator = TestCaseValidator(n_process=server.VALIDATION_N_PROCESS) if server.VALIDATE_OUTPUT else None
+# Serve the trained model when one has been saved; otherwise use the templates
+ml_backend = MLGenerationBackend.from_env(server.MODEL_DIR)
+# Parsed .robot corpus, cached on disk so only changed files are re-parsed at startup
+registry = TemplateRegistry(server.TEMPLATE_DIR)
+generator = TestCaseGenerator(lazy=server.FAST_STARTUP, trimmed=server.FAST_STARTUP,
+                              cache_size=server.CACHE_SIZE, cache_ttl=server.CACHE_TTL,
+                              ml_backend=ml_backend, registry=registry,
+                              retrieval_min_score=server.RETRIEVAL_MIN_SCORE,
+                              retrieval_min_words=server.RETRIEVAL_MIN_WORDS,
+                              metrics=metrics, validator=validator)
+admission = AdmissionController(
+    max_concurrent=server.ADMISSION_MAX_CONCURRENT,
+    max_queue=server.ADMISSION_MAX_QUEUE,
+    queue_timeout=server.ADMISSION_QUEUE_TIMEOUT,
+    metrics=metrics
+)
+http_optimizer = ResponseOptimizer(compress=server.RESPONSE_COMPRESSION, min_size=server.COMPRESS_MIN_SIZE)
+
+def get_xpath_guide_for_prompt(prompt, use_cache=True):
+    """Pick an XPath guide based on the component mentioned in the prompt"""
+    component_type = 'email' if 'email' in prompt.lower() else \
+                    'password' if 'password' in prompt.lower() else \
+                    'button' if 'button' in prompt.lower() else None
+    
+    return generator.get_xpath_guide(component_type, use_cache) if component_type else ""
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record total latency and status per route"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.after_request
+def optimize_response(response):
+    """ETag, 304 and compression; runs before record_request_metrics so its time is counted"""
+    return http_optimizer.finalize(request, response)
 
 @app.route('/')
 def index():
     try:
-        return send_from_directory('../templates', 'index.html')
+        response = send_from_directory('../templates', 'index.html')
+        # Revalidate every time; an unchanged page costs a 304 instead of the full body
+        response.cache_control.no_cache = True
+        return response
     except Exception as e:
         app.logger.error(f"Error serving index.html: {str(e)}")
         return jsonify({
@@ -36,10 +93,11 @@ def serve_static(path):
             'details': str(e)
         }), 500
 
-@app.route('/generate', methods=['POST'])
+@app.route('/generate', methods=['GET', 'POST'])
 def generate():
     try:
-        data = request.get_json()
+        # GET takes the same fields as query parameters, so browsers and proxies can cache the response
+        data = request.args if request.method == 'GET' else request.get_json()
         if not data:
             return jsonify({
                 'error': 'No JSON data received',
@@ -48,6 +106,7 @@ def generate():
 
         prompt = data.get('prompt', '')
         framework = data.get('framework', 'robot')
+        use_cache = query_flag(data.get('cache', True))  # Set to false to bypass the result cache
 
         if not prompt:
             return jsonify({
@@ -55,22 +114,29 @@ def generate():
                 'message': 'Please provide a test case description'
             }), 400
 
-        # Generate test case
-        test_case = generator.generate_test_case(prompt, framework)
-        
-        # Get component type from prompt for XPath guide
-        component_type = 'email' if 'email' in prompt.lower() else \
-                        'password' if 'password' in prompt.lower() else \
-                        'button' if 'button' in prompt.lower() else None
-        
-        xpath_guide = generator.get_xpath_guide(component_type) if component_type else ""
-        
-        return jsonify({
-            'test_case': test_case,
-            'xpath_guide': xpath_guide,
-            'framework': framework
-        })
+        with admission.slot(request_deadline(data)):
+            lap = metrics.timer()
+            # Generate test case
+            test_case = generator.generate_test_case(prompt, framework, use_cache)
+            metrics.observe('generate', lap())
+            
+            # Get XPath guide for the component mentioned in the prompt
+            xpath_guide = get_xpath_guide_for_prompt(prompt, use_cache)
+            metrics.observe('xpath_guide', lap())
+            
+            response = jsonify({
+                'test_case': test_case,
+                'xpath_guide': xpath_guide,
+                'framework': framework
+            })
+            if request.method == 'GET' and use_cache:
+                response.cache_control.public = True
+                response.cache_control.max_age = server.GENERATE_CACHE_MAX_AGE
+            metrics.observe('serialize', lap())
+            return response
 
+    except AdmissionError as e:
+        return overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Error generating test case: {str(e)}\n{traceback.format_exc()}")
         return jsonify({
@@ -79,6 +145,103 @@ def generate():
             'details': str(e)
         }), 500
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'error': 'No JSON data received',
+                'message': 'Please provide prompts and framework in JSON format'
+            }), 400
+
+        prompts = data.get('prompts')
+        framework = data.get('framework', 'robot')
+        use_cache = query_flag(data.get('cache', True))  # Set to false to bypass the result cache
+
+        if not isinstance(prompts, list) or not prompts:
+            return jsonify({
+                'error': 'No prompts provided',
+                'message': 'Please provide a non-empty list of test case descriptions'
+            }), 400
+
+        if len(prompts) > server.MAX_BATCH_PROMPTS:
+            return jsonify({
+                'error': 'Too many prompts',
+                'message': f'A batch may contain at most {server.MAX_BATCH_PROMPTS} prompts'
+            }), 400
+
+        # Parse all prompts together and generate one result per prompt
+        with admission.slot(request_deadline(data)):
+            lap = metrics.timer()
+            results = generator.generate_test_cases(prompts, framework, batch_size=server.BATCH_SIZE, n_process=server.N_PROCESS, use_cache=use_cache)
+            metrics.observe('generate_batch', lap())
+            for prompt, result in zip(prompts, results):
+                result['framework'] = framework
+                if 'test_case' in result:
+                    result['xpath_guide'] = get_xpath_guide_for_prompt(prompt, use_cache)
+            metrics.observe('batch_xpath_guide', lap())
+
+            response = jsonify({'results': results})
+            metrics.observe('batch_serialize', lap())
+            return response
+
+    except AdmissionError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Error generating test cases: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({
+            'error': 'Internal server error',
+            'message': 'Failed to generate test cases. Please try again.',
+            'details': str(e)
+        }), 500
+
+@app.route('/templates', methods=['GET'])
+def list_templates():
+    """List the indexed .robot test cases by category"""
+    return jsonify({
+        category: [
+            {
+                'source': test_case['source'],
+                'name': test_case['name'],
+                'documentation': test_case['documentation'],
+                'keywords': test_case['keywords']
+            }
+            for test_case in registry.by_category(category)
+        ]
+        for category in registry.categories()
+    })
+
+@app.route('/templates/search', methods=['GET'])
+def search_templates():
+    """Return the corpus test cases whose documentation best matches the q parameter"""
+    query = request.args.get('q', '')
+    k = request.args.get('k', 5, type=int)
+    if not query.strip():
+        return jsonify({
+            'error': 'No query provided',
+            'message': 'Please provide a q parameter to search for'
+        }), 400
+    return jsonify({'query': query, 'matches': generator.find_templates(query, max(1, min(k, 50)))})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        'pid': os.getpid(),
+        'classifier': generator.get_classifier_stats(),
+        'cache': generator.cache.stats(),
+        'ml_backend': ml_backend.stats() if ml_backend else None,
+        'admission': admission.stats(),
+        'validation': validator.stats() if validator else None
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms and request counters in Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Not found', 'message': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(e):
@@ -1,56 +1,238 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
 import os
+import time
+from test_generator import server
+from test_generator.admission import AdmissionController, AdmissionError
 from test_generator.generator import TestCaseGenerator
-from test_generator.ml_trainer import TestCaseTrainer
+from test_generator.http_cache import ResponseOptimizer
+from test_generator.metrics import Metrics
+from test_generator.ml_backend import MLGenerationBackend
+from test_generator.registry import TemplateRegistry
+from test_generator.server import overloaded_response, query_flag, request_deadline
+from test_generator.validation import TestCaseValidator
+from test_generator.jobs import JobLimitError, TrainingJobManager
 
 app = Flask(__name__)
-generator = TestCaseGenerator()
+
+metrics = Metrics(enabled=server.METRICS_ENABLED, state_dir=server.METRICS_DIR)
+validator = TestCaseValidator(n_process=server.VALIDATION_N_PROCESS) if server.VALIDATE_OUTPUT else None
+# Serve the trained model when one has been saved; otherwise use the templates
+ml_backend = MLGenerationBackend.from_env(server.MODEL_DIR)
+# Parsed .robot corpus, cached on disk so only changed files are re-parsed at startup
+registry = TemplateRegistry(server.TEMPLATE_DIR)
+generator = TestCaseGenerator(lazy=server.FAST_STARTUP, trimmed=server.FAST_STARTUP,
+                              cache_size=server.CACHE_SIZE, cache_ttl=server.CACHE_TTL,
+                              ml_backend=ml_backend, registry=registry,
+                              retrieval_min_score=server.RETRIEVAL_MIN_SCORE,
+                              retrieval_min_words=server.RETRIEVAL_MIN_WORDS,
+                              metrics=metrics, validator=validator)
+admission = AdmissionController(
+    max_concurrent=server.ADMISSION_MAX_CONCURRENT,
+    max_queue=server.ADMISSION_MAX_QUEUE,
+    queue_timeout=server.ADMISSION_QUEUE_TIMEOUT,
+    metrics=metrics
+)
+http_optimizer = ResponseOptimizer(compress=server.RESPONSE_COMPRESSION, min_size=server.COMPRESS_MIN_SIZE)
+training_jobs = TrainingJobManager(server.MODEL_DIR, max_concurrent=server.MAX_TRAINING_JOBS, state_dir=server.TRAINING_JOBS_DIR)
+
+def get_xpath_guide_for_prompt(prompt, use_cache=True):
+    """Pick an XPath guide based on the component mentioned in the prompt"""
+    component_type = 'email' if 'email' in prompt.lower() else \
+                    'password' if 'password' in prompt.lower() else \
+                    'button' if 'button' in prompt.lower() else None
+    
+    return generator.get_xpath_guide(component_type, use_cache) if component_type else ""
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record total latency and status per route"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+@app.after_request
+def optimize_response(response):
+    """ETag, 304 and compression; runs before record_request_metrics so its time is counted"""
+    return http_optimizer.finalize(request, response)
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    response = app.make_response(render_template('index.html'))
+    # Revalidate every time; an unchanged page costs a 304 instead of the full body
+    response.cache_control.no_cache = True
+    return response
 
-@app.route('/generate', methods=['POST'])
+@app.route('/generate', methods=['GET', 'POST'])
 def generate():
-    prompt = request.json.get('prompt', '')
-    framework = request.json.get('framework', 'robot')  # Default to Robot Framework
+    # GET takes the same fields as query parameters, so browsers and proxies can cache the response
+    data = request.args if request.method == 'GET' else request.json
+    prompt = data.get('prompt', '')
+    framework = data.get('framework', 'robot')  # Default to Robot Framework
+    use_cache = query_flag(data.get('cache', True))  # Set to false to bypass the result cache
     
     try:
-        # Generate test case
-        test_case = generator.generate_test_case(prompt, framework)
-        
-        # Get component type from prompt for XPath guide
-        component_type = 'email' if 'email' in prompt.lower() else \
-                        'password' if 'password' in prompt.lower() else \
-                        'button' if 'button' in prompt.lower() else None
-        
-        xpath_guide = generator.get_xpath_guide(component_type) if component_type else ""
-        
-        return jsonify({
-            'test_case': test_case,
-            'xpath_guide': xpath_guide,
-            'framework': framework
-        })
+        with admission.slot(request_deadline(data)):
+            lap = metrics.timer()
+            # Generate test case
+            test_case = generator.generate_test_case(prompt, framework, use_cache)
+            metrics.observe('generate', lap())
+            
+            # Get XPath guide for the component mentioned in the prompt
+            xpath_guide = get_xpath_guide_for_prompt(prompt, use_cache)
+            metrics.observe('xpath_guide', lap())
+            
+            response = jsonify({
+                'test_case': test_case,
+                'xpath_guide': xpath_guide,
+                'framework': framework
+            })
+            if request.method == 'GET' and use_cache:
+                response.cache_control.public = True
+                response.cache_control.max_age = server.GENERATE_CACHE_MAX_AGE
+            metrics.observe('serialize', lap())
+            return response
+    except AdmissionError as e:
+        return overloaded_response(e)
     except Exception as e:
         return jsonify({
             'error': str(e),
             'message': 'Failed to generate test case. Please try again with a different prompt.'
         }), 400
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch():
+    """Generate test cases for a list of prompts in one request"""
+    data = request.get_json(silent=True) or {}
+    prompts = data.get('prompts')
+    framework = data.get('framework', 'robot')
+    use_cache = query_flag(data.get('cache', True))
+    
+    if not isinstance(prompts, list) or not prompts:
+        return jsonify({
+            'error': 'No prompts provided',
+            'message': 'Please provide a non-empty list of prompts'
+        }), 400
+    if len(prompts) > server.MAX_BATCH_PROMPTS:
+        return jsonify({
+            'error': 'Too many prompts',
+            'message': f'A batch may contain at most {server.MAX_BATCH_PROMPTS} prompts'
+        }), 400
+    
+    try:
+        with admission.slot(request_deadline(data)):
+            lap = metrics.timer()
+            results = generator.generate_test_cases(prompts, framework, batch_size=server.BATCH_SIZE, n_process=server.N_PROCESS, use_cache=use_cache)
+            metrics.observe('generate_batch', lap())
+            for prompt, result in zip(prompts, results):
+                result['framework'] = framework
+                if 'test_case' in result:
+                    result['xpath_guide'] = get_xpath_guide_for_prompt(prompt, use_cache)
+            metrics.observe('batch_xpath_guide', lap())
+            
+            response = jsonify({'results': results})
+            metrics.observe('batch_serialize', lap())
+            return response
+    except AdmissionError as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Failed to generate test cases. Please try again.'
+        }), 400
+
+@app.route('/templates', methods=['GET'])
+def list_templates():
+    """List the indexed .robot test cases by category"""
+    return jsonify({
+        category: [
+            {
+                'source': test_case['source'],
+                'name': test_case['name'],
+                'documentation': test_case['documentation'],
+                'keywords': test_case['keywords']
+            }
+            for test_case in registry.by_category(category)
+        ]
+        for category in registry.categories()
+    })
+
+@app.route('/templates/search', methods=['GET'])
+def search_templates():
+    """Return the corpus test cases whose documentation best matches the q parameter"""
+    query = request.args.get('q', '')
+    k = request.args.get('k', 5, type=int)
+    if not query.strip():
+        return jsonify({
+            'error': 'No query provided',
+            'message': 'Please provide a q parameter to search for'
+        }), 400
+    return jsonify({'query': query, 'matches': generator.find_templates(query, max(1, min(k, 50)))})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Report intent classifier tier hit rates and result cache counters of the process that answers"""
+    return jsonify({
+        'pid': os.getpid(),
+        'classifier': generator.get_classifier_stats(),
+        'cache': generator.cache.stats(),
+        'ml_backend': ml_backend.stats() if ml_backend else None,
+        'admission': admission.stats(),
+        'validation': validator.stats() if validator else None
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latency histograms and request counters in Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Not found', 'message': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/train', methods=['POST'])
 def train_model():
-    """Endpoint to trigger model training"""
+    """Submit a training job; it runs in a separate process"""
+    data = request.get_json(silent=True) or {}
     try:
-        trainer = TestCaseTrainer()
-        trainer.train(num_epochs=5)
-        trainer.save_model(os.path.join(os.path.dirname(__file__), 'test_generator', 'trained_model'))
-        return jsonify({'message': 'Model training completed successfully'})
+        job = training_jobs.submit(
+            num_epochs=int(data.get('num_epochs', 5)),
+            batch_size=int(data.get('batch_size', 4))
+        )
+        return jsonify(dict(job, message='Training job submitted')), 202
+    except JobLimitError as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'A training job is already running. Please try again later.'
+        }), 429
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'message': 'Failed to train model'
+            'message': 'Failed to start model training'
         }), 400
 
+@app.route('/train/jobs', methods=['GET'])
+def list_training_jobs():
+    return jsonify({'jobs': training_jobs.list()})
+
+@app.route('/train/jobs/<job_id>', methods=['GET'])
+def get_training_job(job_id):
+    """Report status and progress (epoch, running loss, examples per second) of a job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Not found', 'message': 'Unknown training job'}), 404
+    return jsonify(job)
+
+@app.route('/train/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_training_job(job_id):
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Not found', 'message': 'Unknown training job'}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     # Download spacy model if not already downloaded
     import spacy.cli
@@ -0,0 +1,244 @@
+"""Benchmarks for the generation hot path, with regression checks against a baseline.
+
+Example:
+    python benchmarks/run_benchmarks.py -o results.json --baseline benchmarks/baseline.json
+
+Measures generate_test_case latency and throughput per framework and test type,
+TestCaseGenerator cold start in a fresh interpreter, /generate end to end through
+Flask's test client, a TestCaseTrainer training step and peak RSS. Every metric
+is written to the JSON output with its unit and whether lower or higher is better.
+With --baseline the run fails (exit code 1) when a metric is worse than the
+baseline by more than --threshold. Baselines are machine specific; record one
+with --save-baseline on the machine that runs the comparison.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FRAMEWORKS = ('robot', 'pytest', 'unittest')
+
+# A prompt that lands on each test type; 'ambiguous' matches several categories and needs the parse
+TEST_TYPE_PROMPTS = {
+    'login': 'test login with valid credentials',
+    'registration': 'test new user signup',
+    'profile': 'change account settings',
+    'default': 'check the footer links on the home page',
+    'ambiguous': 'login and then update the profile'
+}
+
+COLD_START_SCRIPT = """
+import time
+started = time.perf_counter()
+from test_generator.generator import TestCaseGenerator
+TestCaseGenerator({args})
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+except ImportError:
+    maxrss = 0
+print(elapsed, maxrss)
+"""
+
+# Cold start variants: constructor arguments passed to TestCaseGenerator
+COLD_START_VARIANTS = {
+    'eager': '',
+    'lazy': 'lazy=True, trimmed=True'
+}
+
+class Results:
+    """Flat name -> {value, unit, better} mapping, written out as JSON"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better='lower'):
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better}
+
+    def add_timings(self, name, timings):
+        """Record p50/p95 latency in microseconds and throughput for a list of per-call seconds"""
+        timings = sorted(timings)
+        self.add(f"{name}.p50_us", timings[len(timings) // 2] * 1e6, 'us')
+        self.add(f"{name}.p95_us", timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1e6, 'us')
+        self.add(f"{name}.ops_per_sec", len(timings) / sum(timings), 'ops/s', better='higher')
+
+def _time_calls(func, iterations, rounds, warmup=20):
+    """Per-call seconds of the round with the lowest median.
+
+    Keeping the fastest round filters out interference from other processes on a
+    shared machine.
+    """
+    for _ in range(warmup):
+        func()
+    measured = []
+    for _ in range(rounds):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        measured.append(timings)
+    return min(measured, key=statistics.median)
+
+def bench_generation(results, iterations, rounds):
+    """generate_test_case per framework and test type, with the result cache bypassed"""
+    from test_generator.generator import TestCaseGenerator
+    from test_generator.registry import TemplateRegistry
+
+    generator = TestCaseGenerator()
+    for framework in FRAMEWORKS:
+        for test_type, prompt in TEST_TYPE_PROMPTS.items():
+            timings = _time_calls(lambda: generator.generate_test_case(prompt, framework, use_cache=False), iterations, rounds)
+            results.add_timings(f"generate.{framework}.{test_type}", timings)
+        timings = _time_calls(lambda: generator.generate_test_case('test login with valid credentials', framework), iterations, rounds)
+        results.add_timings(f"generate.{framework}.cached", timings)
+
+    # Corpus retrieval answers prompts that match a documented .robot test case
+    corpus_generator = TestCaseGenerator(registry=TemplateRegistry(os.path.join(ROOT, 'test_templates')))
+    for framework in FRAMEWORKS:
+        timings = _time_calls(
+            lambda: corpus_generator.generate_test_case('register with a weak password', framework, use_cache=False),
+            iterations, rounds
+        )
+        results.add_timings(f"generate.{framework}.corpus", timings)
+
+def bench_cold_start(results, repeats):
+    """Import and construct TestCaseGenerator in a fresh interpreter"""
+    for variant, args in COLD_START_VARIANTS.items():
+        times, peaks = [], []
+        for _ in range(repeats):
+            output = subprocess.run(
+                [sys.executable, '-c', COLD_START_SCRIPT.format(args=args)],
+                cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout.split()
+            times.append(float(output[-2]))
+            peaks.append(_rss_to_mb(int(output[-1])))
+        results.add(f"cold_start.{variant}.seconds", statistics.median(times), 's')
+        results.add(f"cold_start.{variant}.peak_rss_mb", statistics.median(peaks), 'MB')
+
+def bench_flask(results, iterations, rounds):
+    """/generate end to end through Flask's test client"""
+    import app as flask_app
+
+    client = flask_app.app.test_client()
+    for framework in FRAMEWORKS:
+        for cached in (False, True):
+            body = {'prompt': 'test login with valid credentials', 'framework': framework, 'cache': cached}
+            def request():
+                response = client.post('/generate', json=body)
+                assert response.status_code == 200, response.get_data(as_text=True)
+            timings = _time_calls(request, iterations, rounds)
+            results.add_timings(f"flask.generate.{framework}.{'cached' if cached else 'uncached'}", timings)
+
+def bench_training(results, steps):
+    """Time TestCaseTrainer training steps; skipped when torch or t5-small is unavailable"""
+    try:
+        from test_generator.ml_trainer import TestCaseTrainer
+        trainer = TestCaseTrainer()
+    except Exception as e:
+        print(f"Skipping training benchmark: {e}", file=sys.stderr)
+        return
+
+    # The first step pays for allocations and is excluded
+    stamps = []
+    trainer.train(
+        num_epochs=1000,
+        batch_size=4,
+        progress_callback=lambda progress: stamps.append(time.perf_counter()),
+        should_stop=lambda: len(stamps) > steps
+    )
+    intervals = [end - start for start, end in zip(stamps, stamps[1:])]
+    results.add('train.step_ms', statistics.median(intervals) * 1000, 'ms')
+    results.add('train.examples_per_sec', 4 / statistics.median(intervals), 'examples/s', better='higher')
+
+def _rss_to_mb(maxrss):
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return _rss_to_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+def compare(current, baseline, threshold, gate=('*',)):
+    """Return (name, baseline, current, change) for gated metrics worse than baseline by more than threshold"""
+    regressions = []
+    for name, metric in current.items():
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in gate):
+            continue
+        base = baseline.get(name)
+        if not base or not base['value']:
+            continue
+        change = (metric['value'] - base['value']) / base['value']
+        worse = change if metric['better'] == 'lower' else -change
+        if worse > threshold:
+            regressions.append((name, base['value'], metric['value'], change))
+    return regressions
+
+BENCHMARKS = ('generation', 'cold_start', 'flask', 'training')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the test case generation hot path')
+    parser.add_argument('-o', '--output', default='bench_results.json', help='JSON file to write results to')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS), help='benchmarks to run (default: all)')
+    parser.add_argument('--iterations', type=int, default=1000, help='timed calls per round of each generation/Flask case (default: 1000)')
+    parser.add_argument('--rounds', type=int, default=3, help='rounds per case; the fastest is reported (default: 3)')
+    parser.add_argument('--cold-start-repeats', type=int, default=3, help='fresh interpreters per cold start variant (default: 3)')
+    parser.add_argument('--train-steps', type=int, default=5, help='timed training steps (default: 5)')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression before failing (default: 0.2)')
+    parser.add_argument('--gate', nargs='+', default=['*'], help="glob patterns of metrics that can fail the run, e.g. '*.p50_us' (default: all)")
+    parser.add_argument('--save-baseline', help='also write the results to this path as the new baseline')
+    args = parser.parse_args(argv)
+
+    results = Results()
+    if 'generation' in args.only:
+        bench_generation(results, args.iterations, args.rounds)
+    if 'cold_start' in args.only:
+        bench_cold_start(results, args.cold_start_repeats)
+    if 'flask' in args.only:
+        bench_flask(results, args.iterations, args.rounds)
+    if 'training' in args.only:
+        bench_training(results, args.train_steps)
+    rss = peak_rss_mb()
+    if rss is not None:
+        results.add('process.peak_rss_mb', rss, 'MB')
+
+    report = {
+        'created_at': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'metrics': results.metrics
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    for name, metric in sorted(results.metrics.items()):
+        print(f"{name:48} {metric['value']:12.2f} {metric['unit']}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['metrics']
+        regressions = compare(results.metrics, baseline, args.threshold, args.gate)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.2f} -> {after:.2f} ({change:+.1%})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
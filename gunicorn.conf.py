@@ -0,0 +1,34 @@
+# gunicorn settings for the production entry point in wsgi.py
+import gc
+import os
+import sys
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+
+# Load and warm the app once in the master, then fork workers that share its memory
+preload_app = True
+
+# No collections in the master while the app loads, so freed objects do not leave
+# holes between long-lived ones that workers would later fill (copying the page)
+gc.disable()
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_generator.server import ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE
+
+# Admission control queues and sheds requests per process, which only happens when a worker
+# holds more requests than it has generation slots. Give each worker a thread for every slot
+# and queue place, plus two for cheap routes such as /metrics, so a burst beyond the limits
+# gets 429/503 from the app instead of waiting in the listen backlog
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', ADMISSION_MAX_CONCURRENT + ADMISSION_MAX_QUEUE + 2))
+
+def post_fork(server, worker):
+    gc.enable()
+
+def worker_exit(server, worker):
+    # Write out the worker's last metrics so the totals on /metrics keep them
+    from app import metrics
+    metrics.flush()
@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+class AdmissionError(Exception):
+    """Raised when a request is shed instead of being run; retry_after is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class QueueFullError(AdmissionError):
+    """Every slot is busy and the wait queue is full"""
+
+class QueueTimeoutError(AdmissionError):
+    """The request's deadline passed while it waited for a slot"""
+
+class AdmissionController:
+    """Bounded work queue in front of CPU-bound generation.
+
+    At most max_concurrent requests run at once and at most max_queue wait for a
+    slot. A request arriving to a full queue fails immediately, and a queued one
+    gives up when its deadline passes, so a burst sheds load instead of making
+    every client slower. Retry-After hints come from a moving average of how long
+    a slot is held.
+    """
+
+    def __init__(self, max_concurrent, max_queue=16, queue_timeout=2.0, metrics=None, window=1000):
+        """max_concurrent: requests allowed to run at once; 0 disables admission control.
+        max_queue: requests allowed to wait for a slot.
+        queue_timeout: longest a request may wait, in seconds; per-request deadlines are capped by it.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.metrics = metrics
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+        self._service_time = None
+        self._waits = deque(maxlen=window)
+        self._counts = Counter({'admitted': 0, 'queue_full': 0, 'queue_timeout': 0})
+
+    @property
+    def enabled(self):
+        return self.max_concurrent > 0
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold a slot for the duration of the block, waiting at most timeout seconds for it"""
+        if not self.enabled:
+            yield
+            return
+        self.acquire(timeout)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def acquire(self, timeout=None):
+        timeout = self.queue_timeout if timeout is None else min(max(timeout, 0.0), self.queue_timeout)
+        arrived = time.perf_counter()
+        with self._condition:
+            # Newcomers do not overtake requests that are already waiting
+            if self.active >= self.max_concurrent or self.waiting:
+                if self.waiting >= self.max_queue:
+                    self._reject('queue_full')
+                    raise QueueFullError('Too many requests are waiting', self._retry_after())
+
+                self.waiting += 1
+                self._update_gauges()
+                try:
+                    deadline = arrived + timeout
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self._reject('queue_timeout')
+                            raise QueueTimeoutError('Timed out waiting for a free worker', self._retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            self.active += 1
+            self._counts['admitted'] += 1
+            waited = time.perf_counter() - arrived
+            self._waits.append(waited)
+            self._update_gauges()
+        if self.metrics is not None:
+            self.metrics.observe('queue_wait', waited)
+
+    def release(self, service_time):
+        with self._condition:
+            self.active -= 1
+            # Exponential moving average of how long a request holds its slot
+            self._service_time = service_time if self._service_time is None else \
+                0.9 * self._service_time + 0.1 * service_time
+            self._update_gauges()
+            self._condition.notify()
+
+    def stats(self):
+        """Return slot usage, queue depth, shed request counts and p50/p99 queue wait in milliseconds"""
+        with self._condition:
+            waits = sorted(self._waits)
+            stats = {
+                'enabled': self.enabled,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'counts': dict(self._counts),
+                'avg_service_ms': self._service_time * 1000 if self._service_time is not None else None
+            }
+        stats['wait_p50_ms'] = self._percentile(waits, 0.50)
+        stats['wait_p99_ms'] = self._percentile(waits, 0.99)
+        return stats
+
+    def _percentile(self, values, fraction):
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+    def _retry_after(self):
+        """Whole seconds until the queue ahead is likely to drain, at least 1"""
+        service_time = self._service_time or 0.0
+        return max(1, math.ceil((self.waiting + 1) * service_time / self.max_concurrent))
+
+    def _reject(self, reason):
+        self._counts[reason] += 1
+        if self.metrics is not None:
+            self.metrics.increment('admission_rejected_total', (('reason', reason),))
+
+    def _update_gauges(self):
+        if self.metrics is not None:
+            self.metrics.set_gauge('admission_in_flight', self.active)
+            self.metrics.set_gauge('admission_queue_depth', self.waiting)
@@ -0,0 +1,182 @@
+"""Generate test cases in bulk from a JSONL file of prompts without running Flask.
+
+Example:
+    python -m test_generator.cli prompts.jsonl -o results.jsonl --framework pytest --workers 4
+
+Each input line is a JSON object; the prompt is read from --prompt-field and the
+record id from --id-field (the 1-based line number when absent). Results are
+appended to the output file as JSONL as soon as each batch finishes, so with
+--resume an interrupted run picks up where it stopped.
+
+As in /generate, prompts are matched against the .robot corpus in --templates and
+every test case is validated in the worker that generated it; output that fails
+validation is written as an error record. --no-validate skips the check.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from .generator import TestCaseGenerator
+from .registry import TemplateRegistry
+from .validation import TestCaseValidator
+
+# Corpus shipped with the repository, used when --templates is not given
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_templates')
+
+# Generator owned by each worker process, created once by _init_worker
+_worker_generator = None
+
+def _init_worker(template_dir=None, validate=True):
+    global _worker_generator
+    _worker_generator = TestCaseGenerator(
+        lazy=True,
+        trimmed=True,
+        registry=TemplateRegistry(template_dir) if template_dir else None,
+        validator=TestCaseValidator() if validate else None
+    )
+
+def _generate_batch(records, framework):
+    """Generate test cases for a batch of (id, prompt) records"""
+    results = _worker_generator.generate_test_cases([prompt for _, prompt in records], framework)
+    return [
+        dict(result, id=record_id, prompt=prompt, framework=framework)
+        for (record_id, prompt), result in zip(records, results)
+    ]
+
+def read_prompts(path, prompt_field='prompt', id_field='id', skip_ids=()):
+    """Yield (id, prompt) pairs from a JSONL file one line at a time"""
+    with open(path, 'r') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {}
+            record_id = record.get(id_field, line_number) if isinstance(record, dict) else line_number
+            if record_id in skip_ids:
+                continue
+            prompt = record.get(prompt_field) if isinstance(record, dict) else None
+            yield record_id, prompt
+
+def load_completed_ids(path):
+    """Return ids already written to a partial output file.
+
+    A trailing line cut off by an interrupted run is truncated so appended
+    results start on a clean line.
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+
+    valid_size = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                completed.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                pass
+            valid_size += len(line)
+
+    if valid_size != os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(valid_size)
+    return completed
+
+def _batches(records, size):
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+def run(input_path, output_path, framework='robot', workers=None, batch_size=64,
+        resume=False, prompt_field='prompt', id_field='id', template_dir=DEFAULT_TEMPLATE_DIR,
+        validate=True, log=sys.stderr):
+    """Stream prompts through a process pool and append results to output_path.
+
+    At most two batches per worker are in flight, so memory stays bounded
+    regardless of the input size. Returns the number of prompts written.
+    template_dir: .robot corpus used for retrieval, or None to use only the built-in templates.
+    validate: check every generated test case before it is written.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    skip_ids = load_completed_ids(output_path) if resume else set()
+    if skip_ids:
+        log.write(f"Resuming: {len(skip_ids)} prompts already in {output_path}\n")
+
+    records = read_prompts(input_path, prompt_field, id_field, skip_ids)
+    batches = _batches(records, batch_size)
+    written = 0
+    started = last_report = time.perf_counter()
+
+    with open(output_path, 'a' if resume else 'w') as out:
+        def write(results):
+            nonlocal written, last_report
+            for result in results:
+                out.write(json.dumps(result) + '\n')
+            out.flush()
+            written += len(results)
+            now = time.perf_counter()
+            if now - last_report >= 1.0:
+                log.write(f"{written} prompts, {written / (now - started):.1f} prompts/s\n")
+                last_report = now
+
+        if workers <= 1:
+            _init_worker(template_dir, validate)
+            for batch in batches:
+                write(_generate_batch(batch, framework))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(template_dir, validate)) as pool:
+                pending = set()
+                for batch in batches:
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(future.result())
+                    pending.add(pool.submit(_generate_batch, batch, framework))
+                for future in pending:
+                    write(future.result())
+
+    elapsed = time.perf_counter() - started
+    rate = written / elapsed if elapsed else 0.0
+    log.write(f"Generated {written} test cases in {elapsed:.2f}s ({rate:.1f} prompts/s)\n")
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate test cases in bulk from a JSONL file of prompts')
+    parser.add_argument('input', help='JSONL file with one prompt object per line')
+    parser.add_argument('-o', '--output', required=True, help='JSONL file to write results to')
+    parser.add_argument('--framework', default='robot', help="robot, pytest, unittest or all (default: robot)")
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count; 1 runs in-process)')
+    parser.add_argument('--batch-size', type=int, default=64, help='prompts sent to a worker at a time (default: 64)')
+    parser.add_argument('--resume', action='store_true', help='skip prompts already present in the output file')
+    parser.add_argument('--prompt-field', default='prompt', help='JSON field holding the prompt (default: prompt)')
+    parser.add_argument('--id-field', default='id', help='JSON field holding the record id (default: id, else line number)')
+    parser.add_argument('--templates', default=DEFAULT_TEMPLATE_DIR, help="directory of .robot files to retrieve from ('' for none)")
+    parser.add_argument('--no-validate', action='store_true', help='write generated test cases without validating them')
+    args = parser.parse_args(argv)
+
+    run(
+        args.input, args.output,
+        framework=args.framework,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        resume=args.resume,
+        prompt_field=args.prompt_field,
+        id_field=args.id_field,
+        template_dir=args.templates or None,
+        validate=not args.no_validate
+    )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,93 @@
+import logging
 import os
 import re
+import threading
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from flask import jsonify
-import spacy
+from .cache import LRUCache
+from .metrics import Metrics
+from .retrieval import WORD, TemplateIndex
+from .steps import STEP_EMITTERS, parse_step, render_steps
+from .validation import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Module header shared by the Selenium-based Python frameworks
+SELENIUM_IMPORTS = {
+    framework: [
+        f"import {framework}",
+        "from selenium import webdriver",
+        "from selenium.webdriver.common.by import By",
+        "from selenium.webdriver.support.ui import WebDriverWait",
+        "from selenium.webdriver.support import expected_conditions as EC",
+        ""
+    ]
+    for framework in ('pytest', 'unittest')
+}
+
+# Expression each Python framework uses to reach the WebDriver inside a test
+DRIVER_EXPRESSIONS = {
+    'pytest': 'driver',
+    'unittest': 'self.driver'
+}
+
+# Framework name that renders every supported framework from a single parse
+ALL_FRAMEWORKS = 'all'
 
 class TestCaseGenerator:
-    def __init__(self):
-        # Load spaCy's small model
-        self.nlp = spacy.load('en_core_web_sm')
+    # Pipes the generator never reads; only the dependency parse (token.dep_) is used
+    UNUSED_PIPES = ['tagger', 'attribute_ruler', 'lemmatizer', 'ner']
+    
+    # Intent keywords per template, in priority order
+    CATEGORY_KEYWORDS = {
+        'login': ['login', 'signin', 'log in'],
+        'registration': ['register', 'signup', 'sign up'],
+        'profile': ['profile', 'account', 'settings']
+    }
+    KEYWORD_CATEGORIES = {word: category for category, words in CATEGORY_KEYWORDS.items() for word in words}
+    # Longest keywords first so overlapping alternatives prefer the longer match
+    KEYWORD_PATTERN = re.compile('|'.join(re.escape(word) for word in sorted(KEYWORD_CATEGORIES, key=len, reverse=True)))
+    # Words that do not say what to test; they are not counted towards retrieval_min_words
+    GENERIC_WORDS = frozenset(['test', 'tests', 'testing', 'case', 'cases', 'check', 'verify',
+                               'a', 'an', 'the', 'and', 'for', 'of', 'on', 'to', 'with'])
+    
+    def __init__(self, lazy=False, trimmed=False, cache_size=1024, cache_ttl=None, ml_backend=None, registry=None,
+                 retrieval_min_score=0.5, retrieval_min_words=2, metrics=None, validator=None):
+        """Create the generator.
+        
+        lazy: defer loading spaCy until the first prompt is parsed.
+        trimmed: load only the tokenizer and parser, excluding UNUSED_PIPES.
+        cache_size/cache_ttl: bound and expiry of the result cache (cache_size=0 disables it).
+        ml_backend: optional MLGenerationBackend; its steps are used when it produces
+        any, otherwise generation falls back to the templates.
+        registry: optional TemplateRegistry whose .robot test cases are compiled into
+        corpus_templates alongside the built-in templates.
+        retrieval_min_score: similarity a documented corpus test case needs to be used
+        for a prompt before the keyword tiers are tried (None disables retrieval).
+        retrieval_min_words: words besides GENERIC_WORDS a prompt needs before retrieval
+        is tried. Character trigrams make one-word prompts like 'password' score high
+        against specific corpus test cases; those prompts get the generic templates.
+        metrics: optional Metrics that receives per-stage timings and generation counts.
+        validator: optional TestCaseValidator; rendered test cases that fail its checks
+        raise ValidationError and are not cached, and invalid ML output falls back to
+        the templates.
+        """
+        self.ml_backend = ml_backend
+        self.registry = registry
+        self.retrieval_min_score = retrieval_min_score
+        self.retrieval_min_words = retrieval_min_words
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.validator = validator
+        self.model_name = 'en_core_web_sm'
+        self._exclude = self.UNUSED_PIPES if trimmed else []
+        self._nlp = None
+        self._nlp_lock = threading.Lock()
+        if not lazy:
+            self._load_nlp()
+        
+        # Generated test cases and XPath guides keyed by normalized prompt and framework
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
         
         # Framework templates
         self.supported_frameworks = {
@@ -15,43 +96,448 @@ class TestCaseGenerator:
             'unittest': self._generate_unittest
         }
         
+        # Frameworks whose renderer reads the components extracted by the parse
+        self.component_frameworks = set()
+        
+        # Prompts decided by each classifier tier
+        self._tier_counts = Counter({'retrieval': 0, 'keyword': 0, 'no_match': 0, 'parse': 0, 'fallback': 0})
+        self._stats_lock = threading.Lock()
+        
         # Load test templates
         self.templates = {
             'login': self._get_login_template,
             'registration': self._get_registration_template,
             'profile': self._get_profile_template
         }
+        
+        # Parse every template once into step IR and pre-render the Python bodies,
+        # so a request only joins strings
+        self.compiled_templates = {
+            test_type: self._compile_template(template_func())
+            for test_type, template_func in self.templates.items()
+        }
+        self.compiled_templates['default'] = self._compile_template(self._get_default_template())
+        
+        # Test cases from the .robot corpus, keyed by (source file, test name), and
+        # the index that matches prompts against their documentation
+        self.corpus_templates = {}
+        self.retrieval_index = None
+        if registry is not None:
+            self.load_corpus()
+    
+    def load_corpus(self):
+        """Refresh the registry and compile its test cases; only changed files are re-parsed.
+        
+        The result cache is cleared, since cached output may come from the old corpus.
+        """
+        self.registry.refresh()
+        corpus_templates = {
+            (test_case['source'], test_case['name']): self._compile_template({
+                'name': test_case['name'],
+                'category': test_case['category'],
+                'steps': self.registry.expand_variables(test_case)
+            })
+            for test_case in self.registry.test_cases()
+        }
+        retrieval_index = TemplateIndex.from_registry(self.registry)
+        self.corpus_templates, self.retrieval_index = corpus_templates, retrieval_index
+        self.cache.clear()
+    
+    def find_templates(self, prompt, k=5):
+        """Return the k corpus test cases whose documentation best matches the prompt.
+        
+        Each match is a dict with the test case's source file, name, category,
+        documentation and cosine similarity score, best first.
+        """
+        if self.retrieval_index is None:
+            return []
+        return [
+            self._describe_match(key, score)
+            for key, score in self.retrieval_index.search(self._normalize_prompt(prompt), k)
+        ]
+    
+    def _describe_match(self, key, score):
+        test_case = self.registry.get(*key)
+        return {
+            'source': test_case['source'],
+            'name': test_case['name'],
+            'category': test_case['category'],
+            'documentation': test_case['documentation'],
+            'score': score
+        }
+    
+    def warmup(self, prompt='login and then update the profile'):
+        """Load spaCy and run a prompt through every template stage for each framework.
+        
+        The ML backend and result cache are bypassed and classifier stats and metrics
+        are left untouched, so a pre-fork server can call this in its master process.
+        """
+        metrics, self.metrics = self.metrics, Metrics(enabled=False)
+        with self._stats_lock:
+            tier_counts = Counter(self._tier_counts)
+        try:
+            text = self._normalize_prompt(prompt)
+            matches = self._match_keywords(text)
+            doc = self.nlp(text)
+            if self.retrieval_index is not None:
+                self.retrieval_index.search_batch([text], 1)
+            for framework in self.supported_frameworks:
+                # Validating here also caches the result for the workers
+                self._validation_errors([self._generate_from_doc(matches, doc, framework)], framework)
+        finally:
+            self.metrics = metrics
+            with self._stats_lock:
+                self._tier_counts = tier_counts
+    
+    def generate_from_template(self, source, name, framework='robot'):
+        """Render the corpus test case with this name in the given .robot file, or None if unknown"""
+        template = self.corpus_templates.get((source, name))
+        return self._check(self._render(template, [], framework), framework) if template else None
+    
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first access when the generator is lazy"""
+        if self._nlp is None:
+            self._load_nlp()
+        return self._nlp
+    
+    def _load_nlp(self):
+        with self._nlp_lock:
+            if self._nlp is None:
+                # Imported here so a lazy generator does not pay for spaCy at startup
+                import spacy
+                self._nlp = spacy.load(self.model_name, exclude=self._exclude)
+    
+    def generate_test_case(self, prompt, framework='robot', use_cache=True):
+        """Generate test cases based on the prompt and selected framework.
+        
+        With framework='all' the prompt is classified once and the result is a dict
+        mapping every supported framework to its test case.
+        """
+        # Each lap() returns the time since the previous one, so stages are timed back to back
+        lap = self.metrics.timer()
+        text = self._normalize_prompt(prompt)
+        key = ('test_case', text, framework)
+        if use_cache:
+            cached = self.cache.get(key)
+            self.metrics.observe('cache_lookup', lap())
+            if cached is not None:
+                self._count_generated(framework, 'cached')
+                return cached
+        
+        if self.ml_backend is not None:
+            test_case = self._render_model_steps(self._model_future(prompt), framework)
+            self.metrics.observe('ml_generate', lap())
+            if test_case is not None:
+                self._count_generated(framework, 'generated')
+                if use_cache:
+                    self.cache.set(key, test_case)
+                return test_case
+        
+        matches = self._match_keywords(text)
+        self.metrics.observe('keyword_match', lap())
+        
+        if self._retrieval_enabled() and self._specific_enough(text):
+            template = self._retrieved_template(self.retrieval_index.search(text, 1), matches)
+            self.metrics.observe('retrieval', lap())
+            if template is not None:
+                test_case = self._render(template, [], framework)
+                self.metrics.observe('render', lap())
+                # A corpus test case that does not render cleanly counts as a miss
+                errors = self._validation_errors([test_case], framework)[0]
+                self.metrics.observe('validate', lap())
+                if not errors:
+                    self._record_tier('retrieval', None)
+                    self._count_generated(framework, template['category'])
+                    if use_cache:
+                        self.cache.set(key, test_case)
+                    return test_case
+                self._log_retrieval_errors(template, errors)
+        
+        # Only run the dependency parse when the keywords are not decisive
+        doc = None
+        if self._needs_parse(matches, framework):
+            doc = self.nlp(text)
+            self.metrics.observe('parse', lap())
+        test_case = self._generate_from_doc(matches, doc, framework, lap)
+        self._check(test_case, framework, lap)
+        if use_cache:
+            self.cache.set(key, test_case)
+        return test_case
+    
+    def generate_test_cases(self, prompts, framework='robot', batch_size=64, n_process=1, use_cache=True):
+        """Generate test cases for many prompts, parsing them together with nlp.pipe.
+        
+        Returns one result per prompt, in order. Each result is either
+        {'test_case': ...} or {'error': ...} so one bad prompt does not fail the batch.
+        Cached prompts are answered directly and only prompts that need the
+        dependency parse are sent through nlp.pipe. Retrieved and keyword template
+        output are each validated in one validator call, so a pool can check the
+        batch in parallel.
+        """
+        results = [None] * len(prompts)
+        texts = {}
+        for index, prompt in enumerate(prompts):
+            if not (isinstance(prompt, str) and prompt.strip()):
+                results[index] = {'error': 'Prompt must be a non-empty string'}
+                continue
+            texts[index] = self._normalize_prompt(prompt)
+            if use_cache:
+                cached = self.cache.get(('test_case', texts[index], framework))
+                if cached is not None:
+                    self._count_generated(framework, 'cached')
+                    results[index] = {'test_case': cached}
+        pending = [index for index in texts if results[index] is None]
+        # Template output waiting for validation, by prompt index
+        rendered = {}
+        
+        if self.ml_backend is not None:
+            # Submit everything first so the backend can decode the prompts in batches
+            futures = {index: self._model_future(prompts[index]) for index in pending}
+            for index, future in futures.items():
+                test_case = self._render_model_steps(future, framework)
+                if test_case is not None:
+                    self._count_generated(framework, 'generated')
+                    if use_cache:
+                        self.cache.set(('test_case', texts[index], framework), test_case)
+                    results[index] = {'test_case': test_case}
+            pending = [index for index in pending if results[index] is None]
+        
+        matches = {index: self._match_keywords(texts[index]) for index in pending}
+        
+        candidates = [index for index in pending if self._specific_enough(texts[index])] if self._retrieval_enabled() else []
+        if candidates:
+            # All candidate prompts are scored against the corpus and ranked together
+            found = self.retrieval_index.search_batch([texts[index] for index in candidates], 1)
+            retrieved = {}
+            for index, top in zip(candidates, found):
+                template = self._retrieved_template(top, matches[index])
+                if template is not None:
+                    retrieved[index] = (template, self._render(template, [], framework))
+            # A corpus test case that does not render cleanly counts as a miss
+            checked = self._validation_errors([test_case for _, test_case in retrieved.values()], framework)
+            for (index, (template, test_case)), errors in zip(retrieved.items(), checked):
+                if errors:
+                    self._log_retrieval_errors(template, errors)
+                    continue
+                self._record_tier('retrieval', None)
+                self._count_generated(framework, template['category'])
+                if use_cache:
+                    self.cache.set(('test_case', texts[index], framework), test_case)
+                results[index] = {'test_case': test_case}
+                del matches[index]
+        
+        to_parse = [index for index in matches if self._needs_parse(matches[index], framework)]
+        
+        docs = {}
+        if to_parse:
+            parsed = self.nlp.pipe(
+                (texts[index] for index in to_parse),
+                batch_size=batch_size,
+                n_process=n_process
+            )
+            docs = dict(zip(to_parse, parsed))
+        
+        for index in matches:
+            try:
+                rendered[index] = self._generate_from_doc(matches[index], docs.get(index), framework)
+            except Exception as e:
+                results[index] = {'error': str(e)}
+        
+        for (index, test_case), errors in zip(rendered.items(), self._validation_errors(list(rendered.values()), framework)):
+            if errors:
+                results[index] = {'error': str(ValidationError(errors))}
+                continue
+            if use_cache:
+                self.cache.set(('test_case', texts[index], framework), test_case)
+            results[index] = {'test_case': test_case}
+        
+        return results
+    
+    def _normalize_prompt(self, prompt):
+        """Lowercase the prompt and collapse whitespace so equivalent prompts share a cache entry"""
+        return ' '.join(prompt.lower().split())
+    
+    def get_classifier_stats(self):
+        """Return how many prompts each classifier tier decided, with hit rates"""
+        with self._stats_lock:
+            counts = dict(self._tier_counts)
+        total = sum(counts.values())
+        return {
+            'total': total,
+            'counts': counts,
+            'hit_rates': {tier: (count / total if total else 0.0) for tier, count in counts.items()},
+            'parse_avoided_rate': (counts['retrieval'] + counts['keyword'] + counts['no_match']) / total if total else 0.0
+        }
     
-    def generate_test_case(self, prompt, framework='robot'):
-        """Generate test cases based on the prompt and selected framework"""
-        # Process the prompt
-        doc = self.nlp(prompt.lower())
+    def _generate_from_doc(self, matches, doc, framework, lap=None):
+        """Build the test case from keyword matches and an optional parse"""
+        lap = lap or self.metrics.timer()
         
         # Extract key information
-        actions = [token.text for token in doc if token.dep_ == 'ROOT']
-        components = [token.text for token in doc if token.dep_ in ('dobj', 'pobj')]
+        components = [token.text for token in doc if token.dep_ in ('dobj', 'pobj')] if doc is not None else []
         
         # Identify test type
-        test_type = self._identify_test_type(prompt)
+        test_type = self._identify_test_type(matches, doc)
+        self.metrics.observe('classify', lap())
         
         # Get template
-        template_func = self.templates.get(test_type, self._get_default_template)
-        test_steps = template_func()
+        test_steps = self.compiled_templates.get(test_type, self.compiled_templates['default'])
+        self.metrics.observe('template_lookup', lap())
         
-        # Convert to specified framework format
+        test_case = self._render(test_steps, components, framework)
+        self.metrics.observe('render', lap())
+        self._count_generated(framework, test_type)
+        return test_case
+    
+    def _count_generated(self, framework, test_type):
+        # Unknown frameworks render as Robot Framework; label them so to keep label values bounded
+        if framework not in self.supported_frameworks and framework != ALL_FRAMEWORKS:
+            framework = 'robot'
+        self.metrics.increment('generated_total', (('framework', framework), ('test_type', test_type)))
+    
+    def _render(self, template, components, framework):
+        """Convert a compiled template to the specified framework format"""
+        if framework == ALL_FRAMEWORKS:
+            return {name: generator(template, components) for name, generator in self.supported_frameworks.items()}
         generator = self.supported_frameworks.get(framework, self._generate_robot_framework)
-        return generator(test_steps, components)
-    
-    def _identify_test_type(self, prompt):
-        """Identify the type of test from the prompt"""
-        prompt = prompt.lower()
-        if any(word in prompt for word in ['login', 'signin', 'log in']):
-            return 'login'
-        elif any(word in prompt for word in ['register', 'signup', 'sign up']):
-            return 'registration'
-        elif any(word in prompt for word in ['profile', 'account', 'settings']):
-            return 'profile'
-        return 'default'
+        return generator(template, components)
+    
+    def _check(self, test_case, framework, lap=None):
+        """Return the test case, or raise ValidationError if the validator finds errors in it"""
+        errors = self._validation_errors([test_case], framework)[0]
+        if lap is not None:
+            self.metrics.observe('validate', lap())
+        if errors:
+            raise ValidationError(errors)
+        return test_case
+    
+    def _validation_errors(self, test_cases, framework):
+        """Validator errors for each rendered test case, prefixed with the framework they came from"""
+        if self.validator is None:
+            return [[] for _ in test_cases]
+        # A framework='all' result holds one source per framework
+        owners, items = [], []
+        for index, test_case in enumerate(test_cases):
+            sources = test_case.items() if framework == ALL_FRAMEWORKS else [(framework, test_case)]
+            for name, source in sources:
+                owners.append((index, name))
+                items.append((source, name))
+        errors = [[] for _ in test_cases]
+        for (index, name), found in zip(owners, self.validator.validate_many(items)):
+            errors[index].extend(f"{name}: {error}" for error in found)
+        return errors
+    
+    def _model_future(self, prompt):
+        """Queue a prompt on the ML backend; None if it cannot take requests.
+        
+        Only whitespace is collapsed: the model was trained on mixed-case
+        [Documentation] text and T5's vocabulary is case-sensitive.
+        """
+        if not self.ml_backend.enabled:
+            return None
+        try:
+            return self.ml_backend.submit(' '.join(prompt.split()))
+        except Exception:
+            logger.exception("ML backend unavailable, using templates")
+            return None
+    
+    def _render_model_steps(self, future, framework):
+        """Render the steps the model generated, or None to fall back to templates"""
+        if future is None:
+            return None
+        try:
+            steps = future.result(self.ml_backend.timeout)
+        except FutureTimeoutError:
+            logger.warning("ML generation took longer than %.1fs, using templates", self.ml_backend.timeout)
+            return None
+        except Exception:
+            logger.exception("ML generation failed, using templates")
+            return None
+        # Ignore output that contains no keyword we know how to render
+        if not any(parse_step(step).keyword in STEP_EMITTERS for step in steps):
+            return None
+        test_case = self._render(self._compile_template({'name': 'Generated Test', 'steps': steps}), [], framework)
+        errors = self._validation_errors([test_case], framework)[0]
+        if errors:
+            logger.warning("Invalid ML output, using templates: %s", '; '.join(errors))
+            return None
+        return test_case
+    
+    def _retrieval_enabled(self):
+        return self.retrieval_min_score is not None and bool(self.retrieval_index)
+    
+    def _specific_enough(self, text):
+        """True when the prompt has retrieval_min_words words besides GENERIC_WORDS"""
+        return len(set(WORD.findall(text)) - self.GENERIC_WORDS) >= self.retrieval_min_words
+    
+    def _retrieved_template(self, top, matches):
+        """The compiled corpus template of the best match, if it scores high enough.
+        
+        A prompt with category keywords only takes a match from one of those categories.
+        """
+        if not top or top[0][1] < self.retrieval_min_score:
+            return None
+        template = self.corpus_templates[top[0][0]]
+        if matches and template['category'] not in {match[0] for match in matches}:
+            return None
+        return template
+    
+    def _log_retrieval_errors(self, template, errors):
+        logger.warning("Corpus test case %r failed validation, using templates: %s",
+                       template['name'], '; '.join(errors))
+    
+    def _match_keywords(self, text):
+        """Find every category keyword in the lowercased prompt with one regex scan.
+        
+        Returns a list of (category, start, end) tuples.
+        """
+        return [(self.KEYWORD_CATEGORIES[m.group()], m.start(), m.end()) for m in self.KEYWORD_PATTERN.finditer(text)]
+    
+    def _needs_parse(self, matches, framework):
+        """Parse when keywords from several categories match or the renderer uses components"""
+        if framework == ALL_FRAMEWORKS:
+            needs_components = bool(self.component_frameworks)
+        else:
+            needs_components = framework in self.component_frameworks
+        return needs_components or len({match[0] for match in matches}) > 1
+    
+    def _identify_test_type(self, matches, doc=None):
+        """Identify the type of test from the keyword matches.
+        
+        Tier 1 (keyword): a single category matched, or none at all.
+        Tier 2 (parse): several categories matched; prefer the one whose keyword is the
+        root verb or an object in the dependency parse.
+        Tier 3 (fallback): the parse did not settle it; use category priority order.
+        """
+        categories = [category for category in self.CATEGORY_KEYWORDS if any(match[0] == category for match in matches)]
+        if not categories:
+            return self._record_tier('no_match', 'default')
+        if len(categories) == 1:
+            return self._record_tier('keyword', categories[0])
+        
+        if doc is not None:
+            heads = [(token.idx, token.idx + len(token.text)) for token in doc if token.dep_ in ('ROOT', 'dobj', 'pobj')]
+            hits = [
+                category for category in categories
+                if any(m_cat == category and start < h_end and h_start < end
+                       for m_cat, start, end in matches for h_start, h_end in heads)
+            ]
+            if len(hits) == 1:
+                return self._record_tier('parse', hits[0])
+        
+        return self._record_tier('fallback', categories[0])
+    
+    def _record_tier(self, tier, test_type):
+        with self._stats_lock:
+            self._tier_counts[tier] += 1
+        return test_type
+    
+    def _compile_template(self, template):
+        """Attach parsed steps and the rendered body for each Python framework"""
+        steps = [parse_step(step) for step in template['steps']]
+        body = {framework: render_steps(steps, driver) for framework, driver in DRIVER_EXPRESSIONS.items()}
+        return dict(template, ir=steps, body=body)
     
     def _get_login_template(self):
         return {
@@ -132,41 +618,13 @@ class TestCaseGenerator:
     
     def _generate_pytest(self, template, components):
         """Convert test steps to pytest format"""
-        test_name = template['name'].lower().replace(' ', '_')
-        steps = template['steps']
+        test_name = re.sub(r'\W+', '_', template['name'].lower()).strip('_')
         
-        test_case = []
-        test_case.append("import pytest")
-        test_case.append("from selenium import webdriver")
-        test_case.append("from selenium.webdriver.common.by import By")
-        test_case.append("from selenium.webdriver.support.ui import WebDriverWait")
-        test_case.append("from selenium.webdriver.support import expected_conditions as EC")
-        test_case.append("")
+        test_case = list(SELENIUM_IMPORTS['pytest'])
         test_case.append(f"def test_{test_name}():")
         test_case.append("    driver = webdriver.Chrome()")
         test_case.append("    try:")
-        
-        for step in steps:
-            if 'Open Browser' in step:
-                test_case.append('        driver.get("http://localhost:3000")')
-            elif 'Input Text' in step or 'Input Password' in step:
-                locator = re.search(r'//\S+', step).group()
-                test_case.append(f'        element = WebDriverWait(driver, 10).until(')
-                test_case.append(f'            EC.presence_of_element_located((By.XPATH, "{locator}"))')
-                test_case.append('        )')
-                test_case.append('        element.send_keys("test")')
-            elif 'Click' in step:
-                locator = re.search(r'//\S+', step).group()
-                test_case.append(f'        element = WebDriverWait(driver, 10).until(')
-                test_case.append(f'            EC.element_to_be_clickable((By.XPATH, "{locator}"))')
-                test_case.append('        )')
-                test_case.append('        element.click()')
-            elif 'Wait Until Page Contains' in step:
-                text = step.split('    ')[-1]
-                test_case.append(f'        WebDriverWait(driver, 10).until(')
-                test_case.append(f'            EC.presence_of_element_located((By.XPATH, "//*[contains(text(), \'{text}\')]"))')
-                test_case.append('        )')
-        
+        test_case.extend(template['body']['pytest'])
         test_case.append("    finally:")
         test_case.append("        driver.quit()")
         
@@ -174,16 +632,12 @@ class TestCaseGenerator:
     
     def _generate_unittest(self, template, components):
         """Convert test steps to unittest format"""
-        test_name = template['name'].replace(' ', '')
-        steps = template['steps']
+        test_name = re.sub(r'\W+', '', template['name'])
+        # Class names cannot be empty or start with a digit
+        if not test_name[:1].isalpha():
+            test_name = f"Test{test_name}"
         
-        test_case = []
-        test_case.append("import unittest")
-        test_case.append("from selenium import webdriver")
-        test_case.append("from selenium.webdriver.common.by import By")
-        test_case.append("from selenium.webdriver.support.ui import WebDriverWait")
-        test_case.append("from selenium.webdriver.support import expected_conditions as EC")
-        test_case.append("")
+        test_case = list(SELENIUM_IMPORTS['unittest'])
         test_case.append(f"class {test_name}(unittest.TestCase):")
         test_case.append("    def setUp(self):")
         test_case.append("        self.driver = webdriver.Chrome()")
@@ -192,36 +646,27 @@ class TestCaseGenerator:
         test_case.append("        self.driver.quit()")
         test_case.append("")
         test_case.append("    def test_main(self):")
-        
-        for step in steps:
-            if 'Open Browser' in step:
-                test_case.append('        self.driver.get("http://localhost:3000")')
-            elif 'Input Text' in step or 'Input Password' in step:
-                locator = re.search(r'//\S+', step).group()
-                test_case.append(f'        element = WebDriverWait(self.driver, 10).until(')
-                test_case.append(f'            EC.presence_of_element_located((By.XPATH, "{locator}"))')
-                test_case.append('        )')
-                test_case.append('        element.send_keys("test")')
-            elif 'Click' in step:
-                locator = re.search(r'//\S+', step).group()
-                test_case.append(f'        element = WebDriverWait(self.driver, 10).until(')
-                test_case.append(f'            EC.element_to_be_clickable((By.XPATH, "{locator}"))')
-                test_case.append('        )')
-                test_case.append('        element.click()')
-            elif 'Wait Until Page Contains' in step:
-                text = step.split('    ')[-1]
-                test_case.append(f'        WebDriverWait(self.driver, 10).until(')
-                test_case.append(f'            EC.presence_of_element_located((By.XPATH, "//*[contains(text(), \'{text}\')]"))')
-                test_case.append('        )')
-        
+        test_case.extend(template['body']['unittest'])
         test_case.append("")
         test_case.append("if __name__ == '__main__':")
         test_case.append("    unittest.main()")
         
         return "\n".join(test_case)
     
-    def get_xpath_guide(self, component_type):
+    def get_xpath_guide(self, component_type, use_cache=True):
         """Generate XPath guide for different component types"""
+        key = ('xpath_guide', component_type)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        guide = self._build_xpath_guide(component_type)
+        if use_cache:
+            self.cache.set(key, guide)
+        return guide
+    
+    def _build_xpath_guide(self, component_type):
         guides = {
             'email': """Common XPath patterns for email fields:
 1. //input[@type='email']
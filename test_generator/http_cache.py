@@ -0,0 +1,86 @@
+import gzip
+
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Media types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/javascript', 'text/css', 'text/html',
+    'text/javascript', 'text/plain', 'image/svg+xml'
+)
+
+class ResponseOptimizer:
+    """Content-hash ETags, If-None-Match handling and gzip/brotli negotiation for Flask responses.
+
+    Call finalize() from an after_request hook. Responses get an ETag derived from
+    their body, and GET and HEAD requests become 304s when the client already holds
+    that version. Compressible bodies are encoded with the best encoding the client
+    accepts; encoded bodies are cached by ETag, so repeat traffic is compressed
+    once. An encoded response carries the weak form of the ETag, which still
+    matches If-None-Match.
+    """
+
+    def __init__(self, compress=True, min_size=512, gzip_level=6, brotli_quality=5, cache_size=256):
+        """compress: set to False when a proxy in front already compresses responses.
+        min_size: bodies smaller than this many bytes are sent uncompressed.
+        cache_size: encoded bodies kept, keyed by ETag and encoding (0 disables the cache).
+        """
+        self.compress = compress
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def finalize(self, request, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        compressible = response.mimetype in COMPRESSIBLE_TYPES
+        if request.method not in ('GET', 'HEAD') and not compressible:
+            return response
+
+        # send_file streams files and tags them by mtime, which differs between hosts;
+        # read the body so the ETag names its content and it can be encoded
+        from_file = response.direct_passthrough
+        response.direct_passthrough = False
+        if from_file or not response.get_etag()[0]:
+            response.add_etag(overwrite=True)
+
+        if request.method in ('GET', 'HEAD'):
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if compressible and self.compress:
+            self._compress(request, response)
+        return response
+
+    def _compress(self, request, response):
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return
+
+        etag, weak = response.get_etag()
+        body = self.cache.get((etag, encoding))
+        if body is None:
+            body = self._encode(data, encoding)
+            self.cache.set((etag, encoding), body)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if not weak:
+            # The encoded bytes differ from the identity body the strong ETag names
+            response.set_etag(etag, weak=True)
+
+    def _encode(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
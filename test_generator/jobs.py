@@ -0,0 +1,297 @@
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Job states that will not change again
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+class JobLimitError(Exception):
+    """Raised when a submission would exceed the concurrent training job cap"""
+
+def _run_training(output_dir, num_epochs, batch_size, events, cancel_event):
+    """Entry point of the training process; reports progress through events"""
+    # Imported here so torch and transformers are only loaded in the training process
+    from .ml_trainer import TestCaseTrainer
+
+    try:
+        events.put(('running', None))
+        trainer = TestCaseTrainer()
+        trainer.train(
+            num_epochs=num_epochs,
+            batch_size=batch_size,
+            progress_callback=lambda progress: events.put(('progress', progress)),
+            should_stop=cancel_event.is_set
+        )
+        if cancel_event.is_set():
+            events.put(('cancelled', None))
+            return
+
+        # Save next to the target and swap in, so readers never see a half-written model
+        staging_dir = f"{output_dir}.partial"
+        trainer.save_model(staging_dir)
+        if os.path.isdir(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(staging_dir, output_dir)
+        events.put(('completed', None))
+    except Exception as e:
+        events.put(('failed', str(e)))
+
+class TrainingJobManager:
+    """Runs TestCaseTrainer jobs in separate processes and tracks their progress.
+
+    Web workers only hold job metadata; the model, torch and transformers live in
+    the spawned training process, which is discarded when the job ends.
+
+    With a state_dir, each job's public state is also written to a JSON file there,
+    so every server process (e.g. each gunicorn worker) can report and cancel any
+    job, and max_concurrent holds across processes. The process that started a job
+    still owns it; a job whose owner has exited is reported as failed.
+    """
+
+    def __init__(self, output_dir, max_concurrent=1, cancel_grace=30.0, history=50, state_dir=None):
+        """output_dir: where completed jobs save the model.
+        max_concurrent: jobs allowed to be queued or running at once.
+        cancel_grace: seconds a cancelled job may take to stop before it is terminated.
+        history: finished jobs kept for status queries.
+        state_dir: directory for job state shared between processes; None keeps it in memory.
+        """
+        self.output_dir = output_dir
+        self.max_concurrent = max_concurrent
+        self.cancel_grace = cancel_grace
+        self.history = history
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        # spawn keeps the child free of the web process's threads and memory
+        self._context = multiprocessing.get_context('spawn')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, num_epochs=5, batch_size=4):
+        """Start a training job and return its public state"""
+        with self._lock, self._shared_lock():
+            jobs = self._all_jobs()
+            active = sum(1 for job in jobs.values() if job['status'] not in FINAL_STATUSES)
+            if active >= self.max_concurrent:
+                raise JobLimitError(f"At most {self.max_concurrent} training job(s) may run at once")
+
+            job_id = uuid.uuid4().hex
+            events = self._context.Queue()
+            cancel_event = self._context.Event()
+            process = self._context.Process(
+                target=_run_training,
+                args=(self.output_dir, num_epochs, batch_size, events, cancel_event),
+                daemon=True
+            )
+            job = {
+                'job_id': job_id,
+                'status': 'queued',
+                'num_epochs': num_epochs,
+                'batch_size': batch_size,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': None,
+                'error': None,
+                '_process': process,
+                '_events': events,
+                '_cancel_event': cancel_event,
+                '_cancel_requested_at': None,
+                '_saved_at': 0.0
+            }
+            self._jobs[job_id] = job
+            self._save(job)
+            self._prune(jobs)
+
+        try:
+            process.start()
+        except Exception as e:
+            # Mark it failed so a job that never started stops counting against max_concurrent
+            self._finish(job, 'failed', f"Training process failed to start: {e}")
+            raise
+        threading.Thread(target=self._monitor, args=(job,), daemon=True).start()
+        return self._public(job)
+
+    def get(self, job_id):
+        """Return the public state of a job, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return self._public(job)
+        return self._load_state(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = self._all_jobs()
+        return sorted(jobs.values(), key=lambda job: job['created_at'])
+
+    def cancel(self, job_id):
+        """Ask a job to stop; it is terminated if it does not stop within cancel_grace"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if job['status'] not in FINAL_STATUSES:
+                    job['status'] = 'cancelling'
+                    job['_cancel_requested_at'] = time.monotonic()
+                    job['_cancel_event'].set()
+                    self._save(job)
+                return self._public(job)
+
+        # Owned by another process; its monitor picks up the request from the marker file
+        state = self._load_state(job_id)
+        if state is None or state['status'] in FINAL_STATUSES:
+            return state
+        open(self._path(job_id, '.cancel'), 'w').close()
+        return dict(state, status='cancelling')
+
+    def _monitor(self, job):
+        """Apply events from the training process until the job finishes"""
+        process = job['_process']
+        events = job['_events']
+        checked_at = 0.0
+        while True:
+            if self.state_dir and not job['_cancel_requested_at'] and time.monotonic() - checked_at >= 1.0:
+                checked_at = time.monotonic()
+                if os.path.exists(self._path(job['job_id'], '.cancel')):
+                    self.cancel(job['job_id'])
+            try:
+                kind, payload = events.get(timeout=1.0)
+            except queue.Empty:
+                cancel_requested_at = job['_cancel_requested_at']
+                if cancel_requested_at and time.monotonic() - cancel_requested_at > self.cancel_grace:
+                    process.terminate()
+                    self._finish(job, 'cancelled')
+                    break
+                if not process.is_alive():
+                    if cancel_requested_at:
+                        self._finish(job, 'cancelled')
+                    else:
+                        self._finish(job, 'failed', f"Training process exited with code {process.exitcode}")
+                    break
+                continue
+
+            if kind in FINAL_STATUSES:
+                self._finish(job, kind, payload)
+                break
+            with self._lock:
+                if kind == 'running':
+                    job['started_at'] = time.time()
+                    if job['status'] == 'queued':
+                        job['status'] = 'running'
+                elif kind == 'progress':
+                    job['progress'] = payload
+                # Progress arrives every step; write it out at most once a second
+                if kind == 'running' or time.monotonic() - job['_saved_at'] >= 1.0:
+                    self._save(job)
+
+        process.join(timeout=self.cancel_grace)
+
+    def _finish(self, job, status, error=None):
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job['finished_at'] = time.time()
+            self._save(job)
+        if self.state_dir:
+            try:
+                os.remove(self._path(job['job_id'], '.cancel'))
+            except OSError:
+                pass
+
+    def _prune(self, jobs):
+        """Forget finished jobs beyond history, oldest first; jobs is the _all_jobs() view"""
+        finished = sorted(
+            (job for job in jobs.values() if job['status'] in FINAL_STATUSES),
+            key=lambda job: job['created_at']
+        )
+        for job in finished[:max(0, len(finished) - self.history)]:
+            self._jobs.pop(job['job_id'], None)
+            if self.state_dir:
+                try:
+                    os.remove(self._path(job['job_id'], '.json'))
+                except OSError:
+                    pass
+
+    def _all_jobs(self):
+        """Public state of every job: shared files, overridden by jobs this process owns"""
+        jobs = {}
+        if self.state_dir:
+            for name in os.listdir(self.state_dir):
+                if name.endswith('.json'):
+                    state = self._load_state(name[:-len('.json')])
+                    if state is not None:
+                        jobs[state['job_id']] = state
+        jobs.update((job_id, self._public(job)) for job_id, job in self._jobs.items())
+        return jobs
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.state_dir, f"{job_id}{suffix}")
+
+    def _save(self, job):
+        if not self.state_dir:
+            return
+        job['_saved_at'] = time.monotonic()
+        path = self._path(job['job_id'], '.json')
+        # Write then rename so readers in other processes never see a partial file;
+        # a failed write only leaves other processes with older state
+        staging_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(staging_path, 'w') as f:
+                json.dump(dict(self._public(job), owner_pid=os.getpid()), f)
+            os.replace(staging_path, path)
+        except OSError:
+            pass
+
+    def _load_state(self, job_id):
+        """Public state of a job from the shared directory, or None if it has no file"""
+        if not self.state_dir or not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id, '.json'), 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        owner_pid = state.pop('owner_pid', None)
+        if state['status'] not in FINAL_STATUSES and owner_pid != os.getpid() and not process_alive(owner_pid):
+            state.update(status='failed', error='The server process running this job exited')
+        return state
+
+    @contextmanager
+    def _shared_lock(self):
+        """Serialize submissions across processes sharing state_dir"""
+        if not self.state_dir or fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.state_dir, '.lock'), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _public(self, job):
+        return {key: value for key, value in job.items() if not key.startswith('_')}
+
+def process_alive(pid):
+    if not pid or os.name != 'posix':
+        # os.kill(pid, 0) would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
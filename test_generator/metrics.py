@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from .jobs import process_alive
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+    """In-process counters, gauges and latency histograms rendered in Prometheus text format.
+
+    Stage timings are plain perf_counter differences recorded under one lock, so a
+    disabled instance costs a method call and an attribute check per observation.
+
+    With a state_dir, each process writes its metrics to a JSON file there at most
+    every flush_interval seconds, and render() sums the counters and histograms of
+    every file, so any server process (e.g. each gunicorn worker) reports totals
+    for all of them. Files of exited processes keep counting, so totals never go
+    backwards; their gauges are dropped, and gauges of live processes get a pid label.
+    """
+
+    def __init__(self, enabled=True, namespace='testgen', buckets=LATENCY_BUCKETS, state_dir=None, flush_interval=1.0):
+        """state_dir: directory for metrics shared between processes; None keeps them in memory.
+        flush_interval: seconds between writes of this process's file.
+        """
+        self.enabled = enabled
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.state_dir = state_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # (metric, label pairs) -> per-bucket counts (last slot is +Inf), sum of observations
+        self._histograms = {}
+        self._counters = defaultdict(int)
+        self._gauges = {}
+        self._flushed_at = 0.0
+        self._flush_timer = None
+        if state_dir and enabled:
+            os.makedirs(state_dir, exist_ok=True)
+            self._remove_exited()
+
+    def observe(self, stage, seconds):
+        """Record how long a stage of request handling took"""
+        if self.enabled:
+            self._observe(('stage_duration_seconds', (('stage', stage),)), seconds)
+
+    def observe_request(self, endpoint, status, seconds):
+        """Record one HTTP request's total latency and status"""
+        if self.enabled:
+            self._observe(('http_request_duration_seconds', (('endpoint', endpoint),)), seconds)
+            self.increment('http_requests_total', (('endpoint', endpoint), ('status', str(status))))
+
+    def increment(self, name, labels=(), amount=1):
+        """Add to a counter; labels is a tuple of (name, value) pairs in a fixed order"""
+        if self.enabled:
+            key = (name, labels)
+            with self._lock:
+                self._counters[key] += amount
+            self._maybe_flush()
+
+    def set_gauge(self, name, value, labels=()):
+        """Set a value that can go up and down, such as a queue depth"""
+        if self.enabled:
+            with self._lock:
+                self._gauges[(name, labels)] = value
+            self._maybe_flush()
+
+    def timer(self):
+        """Return a function giving the seconds since the previous call, for timing consecutive stages"""
+        if not self.enabled:
+            return _no_lap
+        last = [time.perf_counter()]
+        def lap():
+            now = time.perf_counter()
+            elapsed, last[0] = now - last[0], now
+            return elapsed
+        return lap
+
+    def _observe(self, key, seconds):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+        self._maybe_flush()
+
+    def flush(self):
+        """Write this process's metrics to state_dir, for render() in the other processes"""
+        if not (self.state_dir and self.enabled):
+            return
+        self._flushed_at = time.monotonic()
+        histograms, counters, gauges = self._snapshot()
+        path = os.path.join(self.state_dir, f"{os.getpid()}.json")
+        # Write then rename so readers never see a partial file; a failed write only
+        # leaves other processes with older numbers
+        staging_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(staging_path, 'w') as f:
+                json.dump({
+                    'histograms': [[name, labels, counts, total] for (name, labels), (counts, total) in histograms.items()],
+                    'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                    'gauges': [[name, labels, value] for (name, labels), value in gauges.items()]
+                }, f)
+            os.replace(staging_path, path)
+        except OSError:
+            pass
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        if self.state_dir:
+            self.flush()
+            histograms, counters, gauges = self._merge_processes()
+        else:
+            histograms, counters, gauges = self._snapshot()
+
+        lines = []
+        for name in sorted({key[0] for key in histograms}):
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for (_, labels), (counts, total) in sorted(item for item in histograms.items() if item[0][0] == name):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{metric}_bucket{self._labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{self._labels(labels)} {total}")
+                lines.append(f"{metric}_count{self._labels(labels)} {cumulative}")
+        for name in sorted({key[0] for key in counters}):
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for (_, labels), value in sorted(item for item in counters.items() if item[0][0] == name):
+                lines.append(f"{metric}{self._labels(labels)} {value}")
+        for name in sorted({key[0] for key in gauges}):
+            metric = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            for (_, labels), value in sorted(item for item in gauges.items() if item[0][0] == name):
+                lines.append(f"{metric}{self._labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _snapshot(self):
+        with self._lock:
+            histograms = {key: (list(counts), total) for key, (counts, total) in self._histograms.items()}
+            return histograms, dict(self._counters), dict(self._gauges)
+
+    def _merge_processes(self):
+        """Totals over this process's metrics and the files of every other process"""
+        histograms, counters, own_gauges = self._snapshot()
+        pid = os.getpid()
+        gauges = {(name, labels + (('pid', str(pid)),)): value for (name, labels), value in own_gauges.items()}
+        for other_pid, data in self._read_processes():
+            if other_pid == pid:
+                continue
+            for name, labels, counts, total in data['histograms']:
+                key = (name, _label_pairs(labels))
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = (counts, total)
+                else:
+                    histograms[key] = ([a + b for a, b in zip(merged[0], counts)], merged[1] + total)
+            for name, labels, value in data['counters']:
+                key = (name, _label_pairs(labels))
+                counters[key] = counters.get(key, 0) + value
+            if process_alive(other_pid):
+                for name, labels, value in data['gauges']:
+                    gauges[(name, _label_pairs(labels) + (('pid', str(other_pid)),))] = value
+        return histograms, counters, gauges
+
+    def _read_processes(self):
+        """(pid, metrics) for every process file in state_dir"""
+        for pid, path in self._process_files():
+            try:
+                with open(path, 'r') as f:
+                    yield pid, json.load(f)
+            except (OSError, ValueError):
+                continue
+
+    def _process_files(self):
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return []
+        return [
+            (int(name[:-len('.json')]), os.path.join(self.state_dir, name))
+            for name in names
+            if name.endswith('.json') and name[:-len('.json')].isdigit()
+        ]
+
+    def _remove_exited(self):
+        """Drop files left by processes that have exited, such as a previous server run"""
+        for pid, path in self._process_files():
+            if pid != os.getpid() and not process_alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _maybe_flush(self):
+        if not self.state_dir:
+            return
+        wait = self._flushed_at + self.flush_interval - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        elif self._flush_timer is None:
+            # Write the changes out later too, so an idle process does not keep serving stale numbers
+            with self._lock:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait, self._timed_flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+
+    def _timed_flush(self):
+        self._flush_timer = None
+        self.flush()
+
+    def _labels(self, labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+def _no_lap():
+    return 0.0
+
+def _label_pairs(labels):
+    """Label pairs read back from JSON as the tuple of tuples used for keys"""
+    return tuple(tuple(pair) for pair in labels)
+
+def _escape(value):
+    """Escape a label value as the exposition format requires"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,178 @@
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .steps import deserialize_steps
+
+logger = logging.getLogger(__name__)
+
+class MLGenerationBackend:
+    """Serve the trained T5 model, batching concurrent prompts together.
+
+    Requests are queued and a single worker thread decodes up to max_batch_size
+    prompts at a time, waiting at most max_wait_ms after the first one arrives.
+    The model is loaded on the first request and, by default, dynamically
+    quantized to int8 for CPU inference. If loading fails the backend disables
+    itself instead of retrying on every request.
+    """
+
+    def __init__(self, model_dir, quantize=True, max_batch_size=8, max_wait_ms=10,
+                 max_new_tokens=256, latency_window=1000, timeout_ms=10000):
+        """timeout_ms: longest a caller waits for its result before falling back to the templates."""
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_new_tokens = max_new_tokens
+        self.timeout = timeout_ms / 1000.0
+        self.load_error = None
+        self.model = None
+        self.tokenizer = None
+        self._requests = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._worker = None
+        self._latencies = deque(maxlen=latency_window)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+
+    @staticmethod
+    def is_available(model_dir):
+        """True when model_dir holds a saved model"""
+        return os.path.isfile(os.path.join(model_dir, 'config.json'))
+
+    @classmethod
+    def from_env(cls, default_dir):
+        """Build a backend from ML_* environment variables, or None when no model is present"""
+        if os.getenv('ML_BACKEND', 'auto').lower() in ('0', 'false', 'off'):
+            return None
+        model_dir = os.getenv('ML_MODEL_PATH', default_dir)
+        if not cls.is_available(model_dir):
+            return None
+        return cls(
+            model_dir,
+            quantize=os.getenv('ML_QUANTIZE', 'true').lower() in ('1', 'true', 'yes'),
+            max_batch_size=int(os.getenv('ML_MAX_BATCH_SIZE', 8)),
+            max_wait_ms=float(os.getenv('ML_MAX_WAIT_MS', 10)),
+            timeout_ms=float(os.getenv('ML_TIMEOUT_MS', 10000))
+        )
+
+    @property
+    def enabled(self):
+        """False once loading the model has failed"""
+        return self.load_error is None
+
+    def generate(self, prompt, timeout=None):
+        """Return the Robot step lines the model generates for prompt"""
+        return self.submit(prompt).result(self.timeout if timeout is None else timeout)
+
+    def submit(self, prompt):
+        """Queue a prompt and return a Future resolving to its step lines"""
+        self._ensure_worker()
+        future = Future()
+        self._requests.put((prompt, future, time.perf_counter()))
+        return future
+
+    def stats(self):
+        """Return request and batch counts with p50/p99 latency in milliseconds"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            requests, batches = self.requests, self.batches
+        return {
+            'loaded': self.model is not None,
+            'load_error': self.load_error,
+            'requests': requests,
+            'batches': batches,
+            'avg_batch_size': requests / batches if batches else 0.0,
+            'p50_ms': self._percentile(latencies, 0.50),
+            'p99_ms': self._percentile(latencies, 0.99)
+        }
+
+    def _percentile(self, values, fraction):
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._load_lock:
+            if self.load_error is not None:
+                raise RuntimeError(f"ML backend disabled: {self.load_error}")
+            if self.model is None:
+                try:
+                    self._load()
+                except Exception as e:
+                    # A corrupt or partial model would fail the same way on every request
+                    self.load_error = str(e)
+                    logger.exception("Could not load the model from %s; ML backend disabled", self.model_dir)
+                    raise
+            # Started on first use, and again if the previous worker died
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _load(self):
+        # Imported here so the web process only pays for torch when a model is served
+        import torch
+        from transformers import T5ForConditionalGeneration, T5Tokenizer
+
+        tokenizer = T5Tokenizer.from_pretrained(self.model_dir)
+        model = T5ForConditionalGeneration.from_pretrained(self.model_dir)
+        model.eval()
+        if self.quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self._torch = torch
+        self.tokenizer = tokenizer
+        self.model = model
+
+    def _next_batch(self):
+        """Block for one request, then gather more until the batch is full or the deadline passes"""
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                outputs = self._decode([prompt for prompt, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self._latencies.extend(finished - submitted for _, _, submitted in batch)
+            for (_, future, _), output in zip(batch, outputs):
+                try:
+                    future.set_result(deserialize_steps(output))
+                except Exception as e:
+                    future.set_exception(e)
+
+    def _decode(self, prompts):
+        inputs = self.tokenizer(
+            [f"generate test case: {prompt}" for prompt in prompts],
+            padding=True, truncation=True, max_length=512, return_tensors='pt'
+        )
+        with self._torch.inference_mode():
+            # use_cache reuses decoder key/value states across generated tokens
+            output_ids = self.model.generate(
+                **inputs, max_new_tokens=self.max_new_tokens, use_cache=True
+            )
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
@@ -1,32 +1,199 @@
 import torch
-from torch.utils.data import Dataset, DataLoader
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import Dataset, DataLoader, DistributedSampler, IterableDataset, Sampler, get_worker_info
 from transformers import T5ForConditionalGeneration, T5Tokenizer
 import json
 import os
+import random
+import socket
+import time
+from contextlib import nullcontext
 from pathlib import Path
 
+from .registry import TemplateRegistry, expand_variables, iter_test_cases, parse_robot_file
+from .steps import serialize_steps
+
 class TestCaseDataset(Dataset):
-    def __init__(self, data):
+    """Training examples tokenized once up front, without padding"""
+    
+    def __init__(self, data, tokenizer=None, max_length=512):
         self.data = data
-        self.tokenizer = T5Tokenizer.from_pretrained('t5-small')
+        self.tokenizer = tokenizer or T5Tokenizer.from_pretrained('t5-small')
+        
+        inputs = self.tokenizer(
+            [f"generate test case: {item['prompt']}" for item in data],
+            max_length=max_length, truncation=True
+        )
+        targets = self.tokenizer(
+            [item['test_case'] for item in data],
+            max_length=max_length, truncation=True
+        )
+        self.input_ids = inputs.input_ids
+        self.labels = targets.input_ids
         
     def __len__(self):
         return len(self.data)
     
     def __getitem__(self, idx):
-        item = self.data[idx]
-        input_text = f"generate test case: {item['prompt']}"
-        target_text = item['test_case']
+        return {
+            'input_ids': self.input_ids[idx],
+            'labels': self.labels[idx]
+        }
+    
+    def lengths(self):
+        """Token length of each example, used for length bucketing"""
+        return [max(len(input_ids), len(labels)) for input_ids, labels in zip(self.input_ids, self.labels)]
+
+class StreamingTestCaseDataset(IterableDataset):
+    """Stream training examples from .robot directories and JSONL files.
+    
+    sources may mix directories (searched recursively for *.robot), .robot files
+    and .jsonl files with 'prompt' and 'test_case' fields. Each DataLoader worker
+    (on each distributed rank) reads a disjoint share: .robot files are dealt out round-robin and every JSONL
+    file is split into byte ranges, so memory stays flat regardless of corpus size.
+    Examples are tokenized as they are read; shuffle_buffer bounds the shuffle window.
+    """
+    
+    def __init__(self, sources, tokenizer, max_length=512, shuffle_buffer=1000):
+        self.sources = [Path(source) for source in sources]
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.shuffle_buffer = shuffle_buffer
+    
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        # Under torch.distributed every (rank, worker) pair gets its own shard
+        if dist.is_available() and dist.is_initialized():
+            worker_id += dist.get_rank() * num_workers
+            num_workers *= dist.get_world_size()
+        
+        examples = self._iter_examples(worker_id, num_workers)
+        if self.shuffle_buffer > 1:
+            examples = self._shuffle(examples)
+        for example in examples:
+            yield self._tokenize(example)
+    
+    def _iter_examples(self, worker_id, num_workers):
+        robot_files = []
+        jsonl_files = []
+        for source in self.sources:
+            if source.is_dir():
+                robot_files.extend(sorted(source.rglob('*.robot')))
+            elif source.suffix == '.jsonl':
+                jsonl_files.append(source)
+            else:
+                robot_files.append(source)
         
-        inputs = self.tokenizer(input_text, padding='max_length', max_length=512, truncation=True, return_tensors='pt')
-        targets = self.tokenizer(target_text, padding='max_length', max_length=512, truncation=True, return_tensors='pt')
+        for robot_file in robot_files[worker_id::num_workers]:
+            # Parsed whole so *** Variables *** are expanded as TemplateRegistry does
+            with open(robot_file, 'r') as f:
+                parsed = parse_robot_file(f.read())
+            for test_case in parsed['test_cases']:
+                yield {
+                    'prompt': test_case['documentation'] or test_case['name'],
+                    'test_case': serialize_steps(expand_variables(test_case['steps'], parsed['variables']))
+                }
         
+        for jsonl_file in jsonl_files:
+            yield from self._iter_jsonl_range(jsonl_file, worker_id, num_workers)
+    
+    def _iter_jsonl_range(self, path, worker_id, num_workers):
+        """Read the lines that start inside this worker's byte range of a JSONL file"""
+        size = path.stat().st_size
+        start = size * worker_id // num_workers
+        end = size * (worker_id + 1) // num_workers
+        with open(path, 'rb') as f:
+            if start:
+                # Skip the line owned by the previous worker unless we start exactly on a line boundary
+                f.seek(start - 1)
+                f.readline()
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                test_case = record.get('test_case')
+                if not record.get('prompt') or not test_case:
+                    continue
+                yield {
+                    'prompt': record['prompt'],
+                    'test_case': serialize_steps(test_case if isinstance(test_case, list) else test_case.split('\n'))
+                }
+    
+    def _shuffle(self, examples):
+        buffer = []
+        for example in examples:
+            buffer.append(example)
+            if len(buffer) >= self.shuffle_buffer:
+                yield buffer.pop(random.randrange(len(buffer)))
+        random.shuffle(buffer)
+        yield from buffer
+    
+    def _tokenize(self, example):
         return {
-            'input_ids': inputs.input_ids.squeeze(),
-            'attention_mask': inputs.attention_mask.squeeze(),
-            'labels': targets.input_ids.squeeze()
+            'input_ids': self.tokenizer(
+                f"generate test case: {example['prompt']}", max_length=self.max_length, truncation=True
+            ).input_ids,
+            'labels': self.tokenizer(
+                example['test_case'], max_length=self.max_length, truncation=True
+            ).input_ids
         }
 
+class TestCaseCollator:
+    """Pad a batch to its longest example; padded label positions are set to -100 so the loss ignores them"""
+    
+    def __init__(self, pad_token_id):
+        self.pad_token_id = pad_token_id
+    
+    def __call__(self, features):
+        input_length = max(len(feature['input_ids']) for feature in features)
+        label_length = max(len(feature['labels']) for feature in features)
+        
+        input_ids = torch.full((len(features), input_length), self.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(features), input_length), dtype=torch.long)
+        labels = torch.full((len(features), label_length), -100, dtype=torch.long)
+        for row, feature in enumerate(features):
+            input_ids[row, :len(feature['input_ids'])] = torch.tensor(feature['input_ids'])
+            attention_mask[row, :len(feature['input_ids'])] = 1
+            labels[row, :len(feature['labels'])] = torch.tensor(feature['labels'])
+        
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'labels': labels
+        }
+
+class LengthBucketSampler(Sampler):
+    """Batch sampler that groups examples of similar length to minimise padding.
+    
+    Indices are shuffled, split into pools of batch_size * pool_factor, sorted by
+    length within each pool and cut into batches; the batch order is shuffled again.
+    """
+    
+    def __init__(self, lengths, batch_size, pool_factor=50, shuffle=True):
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.pool_size = batch_size * pool_factor
+        self.shuffle = shuffle
+    
+    def __iter__(self):
+        indices = torch.randperm(len(self.lengths)).tolist() if self.shuffle else list(range(len(self.lengths)))
+        batches = []
+        for start in range(0, len(indices), self.pool_size):
+            pool = sorted(indices[start:start + self.pool_size], key=lambda index: self.lengths[index])
+            batches.extend(pool[i:i + self.batch_size] for i in range(0, len(pool), self.batch_size))
+        if self.shuffle:
+            batches = [batches[i] for i in torch.randperm(len(batches)).tolist()]
+        return iter(batches)
+    
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size
+
 class TestCaseTrainer:
     def __init__(self):
         self.model = T5ForConditionalGeneration.from_pretrained('t5-small')
@@ -36,80 +203,144 @@ class TestCaseTrainer:
         
     def prepare_training_data(self):
         """Prepare training data from templates and examples"""
-        training_data = []
         template_dir = Path(__file__).parent.parent / "test_templates"
         
-        # Convert Robot Framework templates to training examples
-        for template_file in template_dir.glob("*.robot"):
-            with open(template_file, 'r') as f:
-                content = f.read()
-                test_cases = self._extract_test_cases(content)
-                
-                for test_case in test_cases:
-                    training_data.append({
-                        'prompt': test_case['documentation'],
-                        'test_case': test_case['steps']
-                    })
-        
-        return training_data
+        # The registry re-parses only .robot files that changed since its last run
+        registry = TemplateRegistry(template_dir)
+        return [
+            {
+                'prompt': test_case['documentation'] or test_case['name'],
+                'test_case': serialize_steps(registry.expand_variables(test_case))
+            }
+            for test_case in registry.test_cases()
+        ]
     
     def _extract_test_cases(self, content):
         """Extract test cases from Robot Framework file"""
-        test_cases = []
-        current_test = None
+        return list(iter_test_cases(content.split('\n')))
+    
+    def train(self, num_epochs=5, batch_size=4, progress_callback=None, should_stop=None, bucket_by_length=False,
+              data_sources=None, num_workers=0):
+        """Train the model on the prepared dataset.
         
-        for line in content.split('\n'):
-            if '*** Test Cases ***' in line:
-                continue
-                
-            if line.strip() and not line.startswith(' '):
-                if current_test:
-                    test_cases.append(current_test)
-                current_test = {'name': line.strip(), 'documentation': '', 'steps': []}
-                
-            elif current_test and line.strip().startswith('[Documentation]'):
-                current_test['documentation'] = line.split('    ', 1)[1].strip()
-                
-            elif current_test and line.strip() and not line.strip().startswith('['):
-                current_test['steps'].append(line.strip())
+        bucket_by_length: batch examples of similar length together to cut padding further.
+        data_sources: .robot directories/files and JSONL files to stream instead of
+        loading test_templates into memory; num_workers DataLoader workers share them.
+        progress_callback: called after every batch with a dict of epoch, batch,
+        running_loss and examples_per_sec.
+        should_stop: checked before every batch; training returns early when it is true.
         
-        if current_test:
-            test_cases.append(current_test)
-            
-        return test_cases
-    
-    def train(self, num_epochs=5, batch_size=4):
-        """Train the model on the prepared dataset"""
-        training_data = self.prepare_training_data()
-        dataset = TestCaseDataset(training_data)
-        dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+        When torch.distributed is initialized (see train_distributed) the model is
+        wrapped in DistributedDataParallel and each rank trains on its own shard.
+        """
+        distributed = dist.is_available() and dist.is_initialized()
+        world_size = dist.get_world_size() if distributed else 1
+        is_main = not distributed or dist.get_rank() == 0
         
+        collator = TestCaseCollator(self.tokenizer.pad_token_id)
+        sampler = None
+        if data_sources:
+            dataset = StreamingTestCaseDataset(data_sources, self.tokenizer)
+            dataloader = DataLoader(dataset, batch_size=batch_size, collate_fn=collator, num_workers=num_workers)
+        elif distributed:
+            dataset = TestCaseDataset(self.prepare_training_data(), self.tokenizer)
+            sampler = DistributedSampler(dataset, shuffle=True)
+            dataloader = DataLoader(dataset, batch_size=batch_size, sampler=sampler, collate_fn=collator)
+        elif bucket_by_length:
+            dataset = TestCaseDataset(self.prepare_training_data(), self.tokenizer)
+            dataloader = DataLoader(dataset, batch_sampler=LengthBucketSampler(dataset.lengths(), batch_size), collate_fn=collator)
+        else:
+            dataset = TestCaseDataset(self.prepare_training_data(), self.tokenizer)
+            dataloader = DataLoader(dataset, batch_size=batch_size, shuffle=True, collate_fn=collator)
+        
+        # DDP averages gradients across ranks during backward()
+        model = DistributedDataParallel(self.model) if distributed else self.model
         optimizer = torch.optim.AdamW(self.model.parameters(), lr=5e-5)
         
-        self.model.train()
+        # A streamed dataset has no length up front
+        num_batches = len(dataloader) if not data_sources else None
+        
+        model.train()
+        examples_seen = 0
+        started = time.perf_counter()
         for epoch in range(num_epochs):
+            if sampler is not None:
+                sampler.set_epoch(epoch)
             total_loss = 0
-            for batch in dataloader:
-                input_ids = batch['input_ids'].to(self.device)
-                attention_mask = batch['attention_mask'].to(self.device)
-                labels = batch['labels'].to(self.device)
-                
-                outputs = self.model(
-                    input_ids=input_ids,
-                    attention_mask=attention_mask,
-                    labels=labels
-                )
-                
-                loss = outputs.loss
-                total_loss += loss.item()
-                
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
+            batch_index = -1
+            # join() lets ranks with fewer streamed batches finish without deadlocking the rest
+            with model.join() if distributed else nullcontext():
+                for batch_index, batch in enumerate(dataloader):
+                    if should_stop and should_stop():
+                        return
+                    
+                    input_ids = batch['input_ids'].to(self.device)
+                    attention_mask = batch['attention_mask'].to(self.device)
+                    labels = batch['labels'].to(self.device)
+                    
+                    outputs = model(
+                        input_ids=input_ids,
+                        attention_mask=attention_mask,
+                        labels=labels
+                    )
+                    
+                    loss = outputs.loss
+                    total_loss += loss.item()
+                    
+                    optimizer.zero_grad()
+                    loss.backward()
+                    optimizer.step()
+                    
+                    examples_seen += input_ids.size(0)
+                    if progress_callback:
+                        progress_callback({
+                            'epoch': epoch + 1,
+                            'num_epochs': num_epochs,
+                            'batch': batch_index + 1,
+                            'num_batches': num_batches,
+                            'running_loss': total_loss / (batch_index + 1),
+                            # Ranks see equal shares, so scale the local rate to the whole job
+                            'examples_per_sec': examples_seen * world_size / (time.perf_counter() - started)
+                        })
             
-            print(f"Epoch {epoch+1}/{num_epochs}, Average Loss: {total_loss/len(dataloader)}")
+            if is_main:
+                print(f"Epoch {epoch+1}/{num_epochs}, Average Loss: {total_loss/max(batch_index + 1, 1)}")
     
     def save_model(self, path):
         """Save the trained model"""
         self.model.save_pretrained(path)
         self.tokenizer.save_pretrained(path)
+
+def _find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _distributed_worker(rank, world_size, port, output_dir, threads_per_process, train_kwargs):
+    """Body of one training process started by train_distributed"""
+    torch.set_num_threads(threads_per_process)
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+    try:
+        # Same seed on every rank so all replicas start from identical weights
+        torch.manual_seed(0)
+        trainer = TestCaseTrainer()
+        trainer.train(**train_kwargs)
+        if rank == 0 and output_dir:
+            trainer.save_model(output_dir)
+        dist.barrier()
+    finally:
+        dist.destroy_process_group()
+
+def train_distributed(num_processes, output_dir=None, **train_kwargs):
+    """Train on CPU with num_processes DistributedDataParallel workers over gloo.
+    
+    The dataset is sharded across processes, gradients are averaged every step and
+    only rank 0 saves the model to output_dir. train_kwargs go to TestCaseTrainer.train.
+    """
+    threads_per_process = max(1, (os.cpu_count() or 1) // num_processes)
+    torch.multiprocessing.spawn(
+        _distributed_worker,
+        args=(num_processes, _find_free_port(), output_dir, threads_per_process, train_kwargs),
+        nprocs=num_processes,
+        join=True
+    )
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from .steps import SEPARATOR, VARIABLE, parse_step
+
+# Bump when the parsed layout changes so stale caches are discarded
+CACHE_VERSION = 3
+
+# Test case settings that describe the test rather than run anything
+SKIPPED_SETTINGS = ('[Documentation]', '[Tags]')
+
+def iter_test_cases(lines):
+    """Yield test cases from the lines of a Robot Framework file, one at a time"""
+    current_test = None
+    in_test_cases = False
+
+    for line in lines:
+        line = line.rstrip('\n')
+        # Only the *** Test Cases *** section holds tests
+        if line.startswith('***'):
+            in_test_cases = 'Test Cases' in line
+            continue
+        if not in_test_cases:
+            continue
+
+        if line.strip() and not line.startswith(' '):
+            if current_test:
+                yield current_test
+            current_test = {'name': line.strip(), 'documentation': '', 'steps': []}
+
+        elif current_test and line.strip().startswith('[Documentation]'):
+            current_test['documentation'] = line.strip()[len('[Documentation]'):].strip()
+
+        # [Setup] and [Teardown] stay steps so rendered tests still open and close the browser
+        elif current_test and line.strip() and not line.strip().startswith(SKIPPED_SETTINGS):
+            current_test['steps'].append(line.strip())
+
+    if current_test:
+        yield current_test
+
+def parse_robot_file(content):
+    """Parse a Robot Framework file into its variables and test cases"""
+    lines = content.split('\n')
+    variables = {}
+    section = None
+    for line in lines:
+        if line.startswith('***'):
+            section = line.strip('* ').lower()
+            continue
+        if section == 'variables' and line.strip() and not line.startswith(' '):
+            cells = SEPARATOR.split(line.strip(), 1)
+            match = VARIABLE.fullmatch(cells[0].rstrip('='))
+            if match:
+                variables[match.group(1)] = cells[1] if len(cells) > 1 else ''
+
+    test_cases = []
+    for test_case in iter_test_cases(lines):
+        test_case['keywords'] = sorted({parse_step(step).keyword for step in test_case['steps']})
+        test_cases.append(test_case)
+    return {'variables': variables, 'test_cases': test_cases}
+
+def expand_variables(steps, variables, keep=('URL', 'BROWSER')):
+    """Return steps with ${NAME} replaced by the file's variables, except those in keep"""
+    def substitute(match):
+        name = match.group(1)
+        return match.group(0) if name in keep or name not in variables else variables[name]
+    return [VARIABLE.sub(substitute, step) for step in steps]
+
+class TemplateRegistry:
+    """Parsed and indexed view of the .robot files in a template directory.
+
+    Parsed files are cached on disk keyed by mtime, size and content hash, so a
+    refresh only re-parses files that changed. Test cases are indexed by category
+    (the file name without its _tests suffix), (source file, name) and keyword.
+    """
+
+    def __init__(self, template_dir, cache_path=None):
+        self.template_dir = Path(template_dir)
+        self.cache_path = Path(cache_path) if cache_path else self.template_dir / '.robot_cache.json'
+        self._files = {}
+        self._lock = threading.Lock()
+        self.parsed_files = 0
+        self.refresh()
+
+    def refresh(self):
+        """Re-parse changed files, drop deleted ones and rebuild the indexes.
+
+        Returns the number of files that had to be parsed.
+        """
+        with self._lock:
+            cached = self._files or self._read_cache()
+            files = {}
+            parsed = 0
+            for path in sorted(self.template_dir.glob('*.robot')):
+                stat = path.stat()
+                entry = cached.get(path.name)
+                if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                    files[path.name] = entry
+                    continue
+
+                content = path.read_bytes()
+                digest = hashlib.sha256(content).hexdigest()
+                if entry and entry['sha256'] == digest:
+                    # Touched but unchanged; keep the parse and remember the new mtime
+                    entry = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                else:
+                    entry = dict(
+                        parse_robot_file(content.decode('utf-8')),
+                        mtime_ns=stat.st_mtime_ns,
+                        size=stat.st_size,
+                        sha256=digest,
+                        category=self._category(path)
+                    )
+                    parsed += 1
+                files[path.name] = entry
+
+            changed = parsed or files.keys() != cached.keys() or any(
+                files[name]['mtime_ns'] != cached[name]['mtime_ns'] for name in files
+            )
+            self._files = files
+            self._build_indexes()
+            if changed:
+                self._write_cache()
+            self.parsed_files += parsed
+            return parsed
+
+    def test_cases(self):
+        """Every test case in the corpus"""
+        return list(self._all)
+
+    def categories(self):
+        return sorted(self._by_category)
+
+    def by_category(self, category):
+        return list(self._by_category.get(category, []))
+
+    def get(self, source, name):
+        """Return the test case with this name in the given .robot file, or None"""
+        return self._by_name.get((source, name))
+
+    def with_keyword(self, keyword):
+        """Test cases that use the given Robot keyword"""
+        return list(self._by_keyword.get(keyword, []))
+
+    def expand_variables(self, test_case, keep=('URL', 'BROWSER')):
+        """Return the test case's steps with its file's variables substituted, except keep"""
+        return expand_variables(test_case['steps'], self._files[test_case['source']]['variables'], keep)
+
+    def _category(self, path):
+        stem = path.stem
+        return stem[:-len('_tests')] if stem.endswith('_tests') else stem
+
+    def _build_indexes(self):
+        self._all = []
+        self._by_category = {}
+        self._by_name = {}
+        self._by_keyword = {}
+        for source, entry in self._files.items():
+            for test_case in entry['test_cases']:
+                test_case = dict(test_case, source=source, category=entry['category'])
+                self._all.append(test_case)
+                self._by_category.setdefault(entry['category'], []).append(test_case)
+                self._by_name[(source, test_case['name'])] = test_case
+                for keyword in test_case['keywords']:
+                    self._by_keyword.setdefault(keyword, []).append(test_case)
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache.get('files', {}) if cache.get('version') == CACHE_VERSION else {}
+
+    def _write_cache(self):
+        # Write then rename so a concurrent reader never sees a partial file;
+        # read-only deployments simply skip persisting the cache
+        staging_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(staging_path, 'w') as f:
+                json.dump({'version': CACHE_VERSION, 'files': self._files}, f)
+            os.replace(staging_path, self.cache_path)
+        except OSError:
+            pass
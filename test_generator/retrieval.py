@@ -0,0 +1,119 @@
+import re
+import zlib
+
+import numpy as np
+
+WORD = re.compile(r'[a-z0-9]+')
+
+def extract_features(text):
+    """Word unigrams, word bigrams and character trigrams of a lowercased text"""
+    words = WORD.findall(text.lower())
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+class TemplateIndex:
+    """Nearest-template retrieval over hashed TF-IDF n-gram vectors.
+
+    Documents are L2-normalized sparse vectors held in CSR form over features: for
+    each hashed feature, the contiguous run of documents that contain it and their
+    weights. Scoring a query only touches the postings of its own features, and a
+    batch of queries is ranked with one top-k over all of their score rows.
+    """
+
+    def __init__(self, documents, n_features=2048):
+        """documents: list of (key, text) pairs; key is returned with each match"""
+        self.n_features = n_features
+        self.keys = [key for key, _ in documents]
+
+        # One (feature, count) pair per distinct feature of each document
+        features, counts, owners = [], [], []
+        for row, (_, text) in enumerate(documents):
+            unique, occurrences = self._hashed_counts(text)
+            features.append(unique)
+            counts.append(occurrences)
+            owners.append(np.full(len(unique), row, dtype=np.int32))
+        features = np.concatenate(features) if documents else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(counts) if documents else np.zeros(0, dtype=np.float32)
+        owners = np.concatenate(owners) if documents else np.zeros(0, dtype=np.int32)
+
+        document_frequency = np.bincount(features, minlength=n_features)
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        weights = (1 + np.log(counts)) * self.idf[features]
+        norms = np.sqrt(np.bincount(owners, weights=weights ** 2, minlength=len(documents)))
+        weights /= np.where(norms == 0, 1, norms)[owners]
+
+        # Postings sorted by feature; those of feature f are [_indptr[f], _indptr[f + 1])
+        order = np.argsort(features, kind='stable')
+        # Stored as the index and weight dtypes np.bincount takes, so scoring converts nothing
+        self._documents = owners[order].astype(np.intp)
+        self._weights = weights[order].astype(np.float64)
+        self._indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+
+    @classmethod
+    def from_registry(cls, registry, n_features=2048):
+        """Index the documented test cases of a TemplateRegistry by (source, name)"""
+        documents = [
+            ((test_case['source'], test_case['name']), f"{test_case['documentation']} {test_case['name']}")
+            for test_case in registry.test_cases()
+            if test_case['documentation']
+        ]
+        return cls(documents, n_features)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prompt, k=5):
+        """Return the top-k (key, score) matches for a prompt, best first"""
+        return self.search_batch([prompt], k)[0]
+
+    def search_batch(self, prompts, k=5):
+        """Return top-k matches for many prompts; top-k runs once over all of their scores"""
+        if not prompts or not self.keys:
+            return [[] for _ in prompts]
+        scores = np.empty((len(prompts), len(self.keys)))
+        for row, prompt in enumerate(prompts):
+            scores[row] = self._scores(*self._query(prompt))
+        return self._top_k(scores, min(k, len(self.keys)))
+
+    def _scores(self, features, weights):
+        """Cosine similarity of one query to every document"""
+        starts = self._indptr[features].tolist()
+        ends = self._indptr[features + 1].tolist()
+        # Each feature's postings are contiguous, so they are copied as slices rather than gathered
+        documents = np.concatenate([
+            self._documents[start:end] for start, end in zip(starts, ends)
+        ] or [self._documents[:0]])
+        contributions = np.concatenate([
+            self._weights[start:end] * weight for start, end, weight in zip(starts, ends, weights.tolist())
+        ] or [self._weights[:0]])
+        return np.bincount(documents, weights=contributions, minlength=len(self.keys))
+
+    def _hashed_counts(self, text):
+        """Distinct hashed feature ids of a text and how often each occurs"""
+        buckets = [zlib.crc32(feature.encode('utf-8')) % self.n_features for feature in extract_features(text)]
+        features, counts = np.unique(np.array(buckets, dtype=np.int64), return_counts=True)
+        return features, counts.astype(np.float32)
+
+    def _query(self, prompt):
+        """Feature ids and L2-normalized sublinear TF-IDF weights of a prompt"""
+        features, counts = self._hashed_counts(prompt)
+        weights = (1 + np.log(counts)) * self.idf[features]
+        norm = np.linalg.norm(weights)
+        return features, weights / norm if norm else weights
+
+    def _top_k(self, scores, k):
+        """Top-k (key, score) lists for each row of a (queries, documents) score matrix"""
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1).tolist()
+        top_scores = np.take_along_axis(top_scores, order, axis=1).tolist()
+        return [
+            [(self.keys[i], score) for i, score in zip(indices, row_scores)]
+            for indices, row_scores in zip(top, top_scores)
+        ]
@@ -0,0 +1,84 @@
+"""Settings and request helpers shared by app.py, api/vercel_app.py and gunicorn.conf.py.
+
+Every setting is read from the environment once, at import; see .env.example.
+"""
+import os
+
+from flask import jsonify
+
+from .admission import QueueFullError
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(ROOT_DIR, 'test_generator', 'trained_model')
+TEMPLATE_DIR = os.path.join(ROOT_DIR, 'test_templates')
+
+def env_flag(name, default='true'):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+# FAST_STARTUP loads a parser-only spaCy pipeline on the first request instead of at import
+FAST_STARTUP = env_flag('FAST_STARTUP')
+# Result cache bound and expiry; RESULT_CACHE_SIZE=0 disables caching
+CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 1024))
+CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', 0)) or None
+# Similarity a documented .robot test case needs to answer a prompt; 'off' disables retrieval
+RETRIEVAL_MIN_SCORE = os.getenv('RETRIEVAL_MIN_SCORE', '0.5')
+RETRIEVAL_MIN_SCORE = None if RETRIEVAL_MIN_SCORE.lower() in ('off', 'none', '') else float(RETRIEVAL_MIN_SCORE)
+# Words besides generic ones like 'test' a prompt needs before retrieval is tried
+RETRIEVAL_MIN_WORDS = int(os.getenv('RETRIEVAL_MIN_WORDS', 2))
+
+# Per-stage latency histograms and request counters served on /metrics; METRICS_ENABLED=false turns them off.
+# Server processes write their metrics to files in METRICS_DIR so /metrics reports totals for all of them
+METRICS_ENABLED = env_flag('METRICS_ENABLED')
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(ROOT_DIR, 'test_generator', 'metrics')) or None
+
+# Generated test cases are compiled (pytest/unittest) or parsed (Robot Framework) before they are
+# returned or cached; VALIDATION_N_PROCESS > 1 checks /generate/batch output in a process pool
+VALIDATE_OUTPUT = env_flag('VALIDATE_OUTPUT')
+VALIDATION_N_PROCESS = int(os.getenv('VALIDATION_N_PROCESS', 1))
+
+# Generation slots per process: requests beyond ADMISSION_MAX_CONCURRENT wait in a queue of at most
+# ADMISSION_MAX_QUEUE for up to ADMISSION_QUEUE_TIMEOUT_MS, then get 429/503 with Retry-After;
+# ADMISSION_MAX_CONCURRENT=0 disables admission control. Generation is CPU-bound Python that
+# holds the GIL, so more than a couple of slots per process only adds latency; scale with workers
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 2))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 16))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', 2000)) / 1000
+
+# Content-hash ETags and gzip/brotli for responses; RESPONSE_COMPRESSION=false leaves
+# compression to a proxy in front. GET /generate responses may be cached for GENERATE_CACHE_MAX_AGE seconds
+RESPONSE_COMPRESSION = env_flag('RESPONSE_COMPRESSION')
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 512))
+GENERATE_CACHE_MAX_AGE = int(os.getenv('GENERATE_CACHE_MAX_AGE', 300))
+
+# nlp.pipe settings for /generate/batch
+BATCH_SIZE = int(os.getenv('SPACY_BATCH_SIZE', 64))
+N_PROCESS = int(os.getenv('SPACY_N_PROCESS', 1))
+MAX_BATCH_PROMPTS = int(os.getenv('MAX_BATCH_PROMPTS', 1000))
+
+# Training runs in separate processes; MAX_TRAINING_JOBS caps how many run at once across
+# all server workers, which share job state through files in TRAINING_JOBS_DIR
+MAX_TRAINING_JOBS = int(os.getenv('MAX_TRAINING_JOBS', 1))
+TRAINING_JOBS_DIR = os.getenv('TRAINING_JOBS_DIR', os.path.join(ROOT_DIR, 'test_generator', 'training_jobs'))
+
+def request_deadline(data):
+    """Seconds the request may wait for a generation slot, from its optional deadline_ms"""
+    try:
+        return float(data['deadline_ms']) / 1000
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def query_flag(value):
+    """JSON booleans pass through; query string values like 'false' or '0' become False"""
+    if isinstance(value, str):
+        return value.lower() not in ('0', 'false', 'no', 'off')
+    return value
+
+def overloaded_response(error):
+    """429 when the queue is full, 503 when the wait outlasted the deadline"""
+    response = jsonify({
+        'error': str(error),
+        'message': 'The server is busy. Please retry after a short wait.'
+    })
+    response.status_code = 429 if isinstance(error, QueueFullError) else 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
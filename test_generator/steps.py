@@ -0,0 +1,267 @@
+import re
+from collections import namedtuple
+
+# One parsed Robot Framework step. locator is set for keywords that act on an element,
+# value holds the remaining argument (URL, text to type, file path, expected text) and
+# assign the names of the variables the keyword's result is assigned to.
+Step = namedtuple('Step', ['keyword', 'locator', 'value', 'raw', 'assign'])
+
+# Robot Framework separates cells with two or more spaces
+SEPARATOR = re.compile(r'\s{2,}')
+VARIABLE = re.compile(r'\$\{(\w+)\}')
+# Leading '${name}=' cells of a step that assigns a keyword's result
+ASSIGNMENT = re.compile(r'[$@&]\{(\w+)\}\s*=?')
+# ${expression} outside a plain variable is evaluated as Python by Robot Framework
+INLINE_PYTHON = re.compile(r'\$\{(.+)\}')
+
+# Keywords whose first argument is an element locator
+LOCATOR_KEYWORDS = {
+    'Input Text', 'Input Password', 'Click Button', 'Click Element', 'Click Link',
+    'Choose File', 'Clear Element Text', 'Page Should Contain Element',
+    'Wait Until Element Is Visible'
+}
+
+# SeleniumLibrary locator strategies and the selenium By attribute each maps to
+LOCATOR_STRATEGIES = {
+    'id': 'ID',
+    'name': 'NAME',
+    'css': 'CSS_SELECTOR',
+    'xpath': 'XPATH',
+    'link': 'LINK_TEXT',
+    'partial link': 'PARTIAL_LINK_TEXT',
+    'class': 'CLASS_NAME',
+    'tag': 'TAG_NAME'
+}
+# 'strategy:value' or 'strategy=value', as SeleniumLibrary parses locators
+LOCATOR_PREFIX = re.compile(r'(\w[\w ]*?)\s*[:=]\s*(.+)')
+
+# Values substituted for Robot variables when rendering Python tests
+VARIABLE_DEFAULTS = {
+    'URL': 'http://localhost:3000'
+}
+# Placeholder typed into inputs whose value is an unresolved Robot variable
+PLACEHOLDER_VALUE = 'test'
+
+# T5's tokenizer folds newlines and runs of spaces into a single space and has no
+# '{' or '}' tokens, so model targets mark step and cell boundaries explicitly and
+# write Robot variables as $(NAME)
+STEP_DELIMITER = ' || '
+CELL_DELIMITER = ' | '
+MODEL_VARIABLE = re.compile(r'\$\((\w+)\)')
+
+def serialize_steps(steps):
+    """Encode Robot step lines as a single line a T5 model can learn and reproduce"""
+    encoded = []
+    for step in steps:
+        cells = SEPARATOR.split(step.strip())
+        encoded.append(CELL_DELIMITER.join(VARIABLE.sub(r'$(\1)', cell) for cell in cells))
+    return STEP_DELIMITER.join(encoded)
+
+def deserialize_steps(text):
+    """Decode model output produced in the serialize_steps format back into step lines"""
+    steps = []
+    for chunk in text.split(STEP_DELIMITER.strip()):
+        cells = [MODEL_VARIABLE.sub(r'${\1}', cell.strip()) for cell in chunk.split(CELL_DELIMITER.strip())]
+        cells = [cell for cell in cells if cell]
+        if cells:
+            steps.append('    '.join(cells))
+    return steps
+
+def normalize_keyword(name):
+    """Robot Framework matches keyword names ignoring case, spaces and underscores"""
+    return name.lower().replace(' ', '').replace('_', '')
+
+def parse_step(raw):
+    """Parse a Robot Framework step line into a Step.
+    
+    Known keywords are returned under their STEP_EMITTERS name however they are
+    written, and '${name}=' cells before the keyword are collected into assign.
+    [Setup] and [Teardown] lines parse as the keyword they run.
+    """
+    cells = SEPARATOR.split(raw.strip())
+    if len(cells) > 1 and normalize_keyword(cells[0]) in ('[setup]', '[teardown]'):
+        cells = cells[1:]
+    assign = []
+    while len(cells) > 1 and ASSIGNMENT.fullmatch(cells[0]):
+        assign.append(ASSIGNMENT.fullmatch(cells.pop(0)).group(1))
+    keyword, args = KEYWORD_NAMES.get(normalize_keyword(cells[0]), cells[0]), cells[1:]
+    if keyword in LOCATOR_KEYWORDS:
+        locator = args[0] if args else None
+        value = args[1] if len(args) > 1 else None
+    else:
+        locator = None
+        value = args[0] if args else None
+    return Step(keyword, locator, value, raw, tuple(assign))
+
+def quote(text):
+    """Quote text as a Python string literal, preferring double quotes"""
+    if '"' in text or '\\' in text:
+        return repr(text)
+    return f'"{text}"'
+
+def xpath_literal(text):
+    """Quote text as an XPath 1.0 string literal.
+    
+    XPath has no escape sequences, so text containing both quote characters is
+    built with concat().
+    """
+    if "'" not in text:
+        return f"'{text}'"
+    if '"' not in text:
+        return f'"{text}"'
+    return 'concat(' + ', "\'", '.join(f"'{part}'" for part in text.split("'")) + ')'
+
+def resolve_value(value):
+    """Substitute known Robot variables; fall back to a placeholder for the rest"""
+    if value is None:
+        return PLACEHOLDER_VALUE
+    resolved = VARIABLE.sub(lambda m: VARIABLE_DEFAULTS.get(m.group(1), m.group(0)), value)
+    return PLACEHOLDER_VALUE if VARIABLE.search(resolved) else resolved
+
+def value_source(value, variables):
+    """Python source for a step value: a variable assigned earlier in the test, or a literal"""
+    match = VARIABLE.fullmatch(value or '')
+    if match and match.group(1).lower() in variables:
+        return variables[match.group(1).lower()]
+    return quote(resolve_value(value))
+
+def python_name(variable):
+    """Local name for a Robot variable that does not shadow the names emitted steps use"""
+    name = variable.lower()
+    return f'{name}_value' if name in ('driver', 'element', 'self') else name
+
+def resolve_locator(locator):
+    """Return the By attribute and value that find a Robot locator's element.
+    
+    XPaths are used as-is and prefixed locators (id:, css=, name:, ...) map to the
+    matching strategy. A variable such as ${ELEMENT} becomes an id lookup to fill
+    in, and any other value matches id or name like SeleniumLibrary's default.
+    """
+    if locator is None:
+        return 'XPATH', "//*[@id='element']"
+    match = VARIABLE.fullmatch(locator)
+    if match:
+        return 'XPATH', f"//*[@id='{match.group(1).lower()}']"
+    if locator.startswith(('//', '(//')):
+        return 'XPATH', locator
+    prefixed = LOCATOR_PREFIX.fullmatch(locator)
+    if prefixed:
+        strategy = prefixed.group(1).lower()
+        if strategy in LOCATOR_STRATEGIES:
+            return LOCATOR_STRATEGIES[strategy], prefixed.group(2)
+        if strategy == 'identifier':
+            locator = prefixed.group(2)
+    literal = xpath_literal(locator)
+    return 'XPATH', f"//*[@id={literal} or @name={literal}]"
+
+def _by(locator):
+    """Source for the (by, value) arguments of a selenium find call"""
+    strategy, value = resolve_locator(locator)
+    return f'By.{strategy}, {quote(value)}'
+
+def _wait_for(driver, condition, locator):
+    return [
+        f'element = WebDriverWait({driver}, 10).until(',
+        f'    EC.{condition}(({_by(locator)}))',
+        ')'
+    ]
+
+def _emit_open_browser(step, driver, variables):
+    url = resolve_value(step.value) if step.value else VARIABLE_DEFAULTS['URL']
+    return [f'{driver}.get({quote(url)})']
+
+def _emit_go_to(step, driver, variables):
+    return [f'{driver}.get({value_source(step.value, variables)})']
+
+def _emit_maximize(step, driver, variables):
+    return [f'{driver}.maximize_window()']
+
+def _emit_input(step, driver, variables):
+    return _wait_for(driver, 'presence_of_element_located', step.locator) + [
+        f'element.send_keys({value_source(step.value, variables)})'
+    ]
+
+def _emit_click(step, driver, variables):
+    return _wait_for(driver, 'element_to_be_clickable', step.locator) + ['element.click()']
+
+def _emit_clear(step, driver, variables):
+    return _wait_for(driver, 'presence_of_element_located', step.locator) + ['element.clear()']
+
+def _emit_wait_visible(step, driver, variables):
+    return _wait_for(driver, 'visibility_of_element_located', step.locator)
+
+def _emit_wait_text(step, driver, variables):
+    xpath = f"//*[contains(text(), {xpath_literal(resolve_value(step.value))})]"
+    return [
+        f'WebDriverWait({driver}, 10).until(',
+        f'    EC.presence_of_element_located((By.XPATH, {quote(xpath)}))',
+        ')'
+    ]
+
+def _emit_page_contains_element(step, driver, variables):
+    return [f'assert {driver}.find_elements({_by(step.locator)})']
+
+def _emit_page_contains(step, driver, variables):
+    return [f'assert {value_source(step.value, variables)} in {driver}.page_source']
+
+def _emit_title_should_be(step, driver, variables):
+    return [f'assert {driver}.title == {value_source(step.value, variables)}']
+
+def _emit_set_variable(step, driver, variables):
+    if not step.assign:
+        return []
+    inline = INLINE_PYTHON.fullmatch(step.value or '')
+    if step.value is None:
+        source = "''"
+    elif inline and not VARIABLE.fullmatch(step.value):
+        source = inline.group(1)
+    else:
+        source = value_source(step.value, variables)
+    name = python_name(step.assign[0])
+    variables[step.assign[0].lower()] = name
+    return [f'{name} = {source}']
+
+def _emit_nothing(step, driver, variables):
+    # Closing the browser is handled by the framework's teardown
+    return []
+
+def _emit_unsupported(step, driver, variables):
+    return [f'# Unsupported Robot step: {step.raw.strip()}']
+
+# Robot keyword -> emitter returning Python lines for a driver expression
+STEP_EMITTERS = {
+    'Open Browser': _emit_open_browser,
+    'Go To': _emit_go_to,
+    'Maximize Browser Window': _emit_maximize,
+    'Input Text': _emit_input,
+    'Input Password': _emit_input,
+    'Choose File': _emit_input,
+    'Click Button': _emit_click,
+    'Click Element': _emit_click,
+    'Click Link': _emit_click,
+    'Clear Element Text': _emit_clear,
+    'Wait Until Element Is Visible': _emit_wait_visible,
+    'Wait Until Page Contains': _emit_wait_text,
+    'Page Should Contain Element': _emit_page_contains_element,
+    'Page Should Contain': _emit_page_contains,
+    'Title Should Be': _emit_title_should_be,
+    'Set Variable': _emit_set_variable,
+    'Close Browser': _emit_nothing,
+    '[Teardown]': _emit_nothing
+}
+
+# normalize_keyword(name) -> STEP_EMITTERS name
+KEYWORD_NAMES = {normalize_keyword(keyword): keyword for keyword in STEP_EMITTERS}
+
+def render_steps(steps, driver, indent='        '):
+    """Render parsed steps as Selenium calls on the given driver expression"""
+    lines = []
+    # Lowercased Robot variable name -> Python local assigned by an earlier step
+    variables = {}
+    for step in steps:
+        emitter = STEP_EMITTERS.get(step.keyword, _emit_unsupported)
+        lines.extend(indent + line for line in emitter(step, driver, variables))
+    # Comments alone do not make a block
+    if not any(not line.lstrip().startswith('#') for line in lines):
+        lines.append(indent + 'pass')
+    return lines
@@ -0,0 +1,136 @@
+import ast
+import hashlib
+import importlib.util
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import LRUCache
+
+# Checker used for each framework's output; unknown frameworks render as Robot Framework
+LANGUAGES = {
+    'robot': 'robot',
+    'pytest': 'python',
+    'unittest': 'python'
+}
+
+class ValidationError(Exception):
+    """Raised when generated test case source does not parse; errors lists each problem"""
+
+    def __init__(self, errors):
+        super().__init__(f"Generated test case failed validation: {'; '.join(errors)}")
+        self.errors = errors
+
+def check_python(source):
+    """Compile Python source without running it; returns a list of error messages"""
+    try:
+        compile(source, '<test_case>', 'exec', dont_inherit=True)
+    except SyntaxError as e:
+        return [f"line {e.lineno}: {e.msg}" if e.lineno else e.msg]
+    except ValueError as e:
+        return [str(e)]
+    return []
+
+def check_robot(source):
+    """Parse Robot Framework source with its parsing API, as robot --dryrun would before running"""
+    # Imported here so Robot Framework is only loaded once Robot output is checked
+    from robot.api import get_model
+
+    # Model nodes are ast.AST subclasses; collect the errors the parser attached to them
+    errors, test_cases = [], 0
+    for node in ast.walk(get_model(source)):
+        kind = type(node).__name__
+        if kind == 'TestCase':
+            test_cases += 1
+        elif kind == 'InvalidSection':
+            errors.append((node.lineno, f"Unrecognized section header '{node.header.name}'"))
+        errors.extend((node.lineno, error) for error in getattr(node, 'errors', ()))
+    errors = [f"line {lineno}: {error}" for lineno, error in sorted(errors, key=lambda error: error[0])]
+    if not test_cases:
+        errors.append('Suite contains no test cases')
+    return errors
+
+CHECKERS = {
+    'python': check_python,
+    'robot': check_robot
+}
+
+def _check(language, source):
+    return CHECKERS[language](source)
+
+class TestCaseValidator:
+    """Static checks for generated test cases, run in-process instead of one subprocess per file.
+
+    pytest and unittest output is compiled with compile(); Robot Framework output is
+    parsed with robot.api.get_model. Results are cached by a hash of the source, so
+    output the generator has produced before is never checked again. Batches send
+    their unchecked sources to a process pool when n_process > 1.
+    """
+
+    def __init__(self, cache_size=4096, n_process=1, min_pool_batch=16):
+        """cache_size: results kept, keyed by content hash (0 disables the cache).
+        n_process: worker processes for validate_many; 1 checks batches in-process.
+        min_pool_batch: unchecked sources a batch needs before the pool is used.
+        """
+        self.cache = LRUCache(maxsize=cache_size)
+        self.n_process = n_process
+        self.min_pool_batch = min_pool_batch
+        # Without robotframework installed Robot Framework output is accepted unchecked
+        robot_installed = importlib.util.find_spec('robot') is not None
+        self.languages = [language for language in CHECKERS if language != 'robot' or robot_installed]
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def validate(self, source, framework):
+        """Return the errors found in one test case's source; empty when it is valid"""
+        return self.validate_many([(source, framework)])[0]
+
+    def validate_many(self, items):
+        """Return the errors for each (source, framework) pair, in order"""
+        keys = [self._key(source, framework) for source, framework in items]
+        results = [self.cache.get(key) for key in keys]
+
+        # Each distinct unchecked source is checked once, however often it repeats in the batch
+        pending = {}
+        for key, result, (source, _) in zip(keys, results, items):
+            if result is None and key[0] in self.languages:
+                pending.setdefault(key, source)
+        if pending:
+            languages = [key[0] for key in pending]
+            if self.n_process > 1 and len(pending) >= self.min_pool_batch:
+                chunksize = max(1, len(pending) // (self.n_process * 4))
+                checked = list(self._executor().map(_check, languages, pending.values(), chunksize=chunksize))
+            else:
+                checked = [_check(language, source) for language, source in zip(languages, pending.values())]
+            for key, errors in zip(pending, checked):
+                self.cache.set(key, errors)
+            checked = dict(zip(pending, checked))
+            results = [checked.get(key, result) for key, result in zip(keys, results)]
+
+        return [result if result is not None else [] for result in results]
+
+    def stats(self):
+        """Return the checked languages, pool size and result cache counters"""
+        return {
+            'languages': self.languages,
+            'n_process': self.n_process,
+            'cache': self.cache.stats()
+        }
+
+    def close(self):
+        """Shut down the worker pool, if one was started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _key(self, source, framework):
+        language = LANGUAGES.get(framework, 'robot')
+        return language, hashlib.blake2b(source.encode('utf-8'), digest_size=16).digest()
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn keeps the workers free of the web process's threads and memory
+                self._pool = ProcessPoolExecutor(self.n_process, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
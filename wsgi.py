@@ -0,0 +1,17 @@
+"""Production WSGI entry point for pre-fork servers such as gunicorn.
+
+    gunicorn wsgi:app    (settings are read from gunicorn.conf.py)
+
+With preload_app the master imports this module once: spaCy is loaded and a
+warmup prompt is run through every framework, then every object allocated so far
+is moved to the garbage collector's permanent generation. Forked workers start
+warm and share those pages copy-on-write instead of each loading its own model;
+a collection in a worker would otherwise write to every object header and copy
+the pages.
+"""
+import gc
+
+from app import app, generator
+
+generator.warmup()
+gc.freeze()